@@ -0,0 +1,85 @@
+"""Synthetic MFlix-like catalogs and ratings shared by the local stand-ins."""
+
+import datetime
+import random
+
+WORDS = [
+    "love", "war", "space", "night", "city", "dark", "blue", "king", "river", "ghost",
+    "road", "dream", "iron", "fire", "star", "secret", "last", "golden", "lost", "wild",
+    "storm", "shadow", "heart", "winter", "summer", "silent", "broken", "hidden", "red", "sea",
+]
+GENRES = [
+    "Drama", "Comedy", "Action", "Horror", "Romance", "Sci-Fi", "Thriller", "Western",
+    "Crime", "Adventure", "Animation", "Documentary", "Family", "Fantasy", "Mystery",
+]
+FIRST_NAMES = ["John", "Ann", "Bob", "Carl", "Dana", "Eve", "Fay", "Gus", "Hana", "Ivan", "Jill", "Kurt"]
+LAST_NAMES = ["Smith", "Lee", "Ray", "Moe", "Fox", "Park", "Wu", "Diaz", "Khan", "Rossi", "Berg", "Novak"]
+
+
+def object_id(i):
+    """Deterministic 24 hex digit id of the i-th movie"""
+    return f"{0x5a0000000000000000000000 + i:024x}"
+
+
+def make_movies(count, seed=0):
+    """count movie documents shaped like sample_mflix.movies, with string _ids"""
+    rnd = random.Random(seed)
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    movies = []
+    for i in range(count):
+        title = " ".join(rnd.sample(WORDS, rnd.randint(1, 3))).title()
+        year = rnd.randint(1920, 2020)
+        movies.append({
+            "_id": object_id(i),
+            "title": f"{title} {i}" if rnd.random() < 0.8 else title,
+            "year": year,
+            "runtime": rnd.randint(70, 180),
+            "genres": rnd.sample(GENRES, rnd.randint(1, 3)),
+            "cast": rnd.sample(names, rnd.randint(2, 8)),
+            "directors": rnd.sample(names, rnd.randint(1, 2)),
+            "writers": rnd.sample(names, rnd.randint(1, 3)),
+            "plot": " ".join(rnd.choices(WORDS, k=20)),
+            "fullplot": " ".join(rnd.choices(WORDS, k=120)),
+            "poster": f"https://example.com/posters/{i}.jpg",
+            "languages": ["English"],
+            "countries": ["USA"],
+            "released": f"{year}-01-01T00:00:00.000Z",
+            "rated": "PG",
+            "type": "movie",
+            "awards": {"wins": rnd.randint(0, 10), "nominations": rnd.randint(0, 20), "text": ""},
+            "imdb": {
+                "id": 10000 + i,
+                # A few movies have no usable rating, as in the real dataset
+                "rating": round(rnd.uniform(1, 10), 1) if rnd.random() > 0.02 else "",
+                "votes": rnd.randint(5, 2000000),
+            },
+            "tomatoes": {
+                "lastUpdated": None,
+                "viewer": {"rating": round(rnd.uniform(0, 5), 1), "numReviews": rnd.randint(0, 50000), "meter": rnd.randint(0, 100)},
+                "critic": {"rating": round(rnd.uniform(0, 10), 1), "numReviews": rnd.randint(0, 300), "meter": rnd.randint(0, 100)},
+            },
+            "num_mflix_comments": rnd.randint(0, 200),
+            "lastupdated": f"2015-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 00:00:00.000000000",
+        })
+    return movies
+
+
+def user_email(i):
+    return f"user{i}@bench.local"
+
+
+def make_ratings(movies, users, per_user=20, seed=0):
+    """Rating documents shaped like ratings_db.ratings; user i rates up to 2*per_user movies"""
+    rnd = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+    ratings = []
+    for i in range(users):
+        for movie in rnd.sample(movies, min(len(movies), rnd.randint(0, 2 * per_user))):
+            ratings.append({
+                "email": user_email(i),
+                "movieId": movie["_id"],
+                "rating": rnd.randint(1, 5),
+                "comment": "",
+                "timestamp": start + datetime.timedelta(minutes=rnd.randint(0, 500000)),
+            })
+    return ratings
@@ -0,0 +1,72 @@
+"""Helpers shared by the benchmark scripts."""
+
+import os
+import resource
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_PATHS = {
+    "randommovies": os.path.join(ROOT, "randommovies", "app"),
+    "recomendador": os.path.join(ROOT, "recomendador"),
+}
+
+
+def use_service(service):
+    """Make the modules of service importable.
+
+    Both services have top-level modules with the same names (cache, ...),
+    so a process should only ever use one of them.
+    """
+    sys.path.insert(0, SERVICE_PATHS[service])
+
+
+def percentile(values, p):
+    """p-th percentile (0-100) of values, by nearest rank"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb(pid=None):
+    """Peak resident set size in MB of pid (Linux), or of this process"""
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    line = "  ".join(f"{{:>{width}}}" for width in widths)
+    print(line.format(*headers))
+    for row in rows:
+        print(line.format(*row))
+
+
+def latency_row(name, seconds, errors=0, elapsed=None):
+    """Table row with count, errors, p50/p95/p99 in ms and throughput.
+
+    Throughput is over elapsed wall time, or over the summed latencies for
+    sequential runs.
+    """
+    ms = [s * 1000 for s in seconds]
+    elapsed = sum(seconds) if elapsed is None else elapsed
+    throughput = len(seconds) / elapsed if elapsed else float("nan")
+    return [
+        name, len(seconds), errors,
+        f"{percentile(ms, 50):.2f}", f"{percentile(ms, 95):.2f}", f"{percentile(ms, 99):.2f}",
+        f"{throughput:.1f}",
+    ]
+
+
+LATENCY_HEADERS = ["benchmark", "count", "errors", "p50 ms", "p95 ms", "p99 ms", "per s"]
@@ -0,0 +1,153 @@
+"""In-memory MongoDB stand-in for the recommender service, built on mongomock.
+
+install() seeds sample_mflix.movies and ratings_db.ratings with a synthetic
+catalog and points every client the recommender creates (sync and async) at
+the same in-memory server. Ratings are looked up by email through a dict,
+as the real collection is through its index. Change streams are not
+available, so run the service with MODEL_UPDATE_INTERVAL=0.
+"""
+
+import mongomock
+from bson import ObjectId
+from mongomock.aggregate import process_pipeline
+
+from catalog import make_movies, make_ratings
+
+
+class RatingsCollection:
+    """ratings_db.ratings with the email index the service relies on.
+
+    mongomock scans (and copies) the whole collection on every find and
+    aggregate, which would make the stand-in, not the service, the
+    bottleneck. Queries that select by email are answered from a dict
+    instead; anything else falls back to mongomock.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._by_email = {}
+        for document in collection.find():
+            self._by_email.setdefault(document["email"], []).append(document)
+
+    def _select(self, query):
+        if set(query) == {"email"}:
+            email = query["email"]
+            emails = email["$in"] if isinstance(email, dict) else [email]
+            return [dict(document) for email in emails for document in self._by_email.get(email, ())]
+        return list(self._collection.find(query))
+
+    def find(self, query=None, projection=None):
+        return _Query(self._select(query or {}), projection)
+
+    def aggregate(self, pipeline):
+        if pipeline and "$match" in pipeline[0]:
+            documents, pipeline = self._select(pipeline[0]["$match"]), pipeline[1:]
+        else:
+            documents = list(self._collection.find())
+        return process_pipeline(documents, self._collection.database, pipeline, None)
+
+    def create_index(self, *args, **kwargs):
+        return self._collection.create_index(*args, **kwargs)
+
+    def insert_one(self, document):
+        result = self._collection.insert_one(document)
+        self._by_email.setdefault(document["email"], []).append(document)
+        return result
+
+
+class _Query:
+    def __init__(self, documents, projection):
+        self._documents = documents
+        self._stages = [{"$project": projection}] if projection else []
+
+    def sort(self, key_or_list, direction=None):
+        keys = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else key_or_list
+        self._stages.insert(0, {"$sort": dict(keys)})
+        return self
+
+    def __iter__(self):
+        return iter(process_pipeline(self._documents, None, self._stages, None))
+
+
+class _Database:
+    def __init__(self, collection):
+        self.ratings = collection
+
+
+class RatingsClient:
+    """Just enough of MongoClient for ratings.RatingsStore"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getitem__(self, name):
+        return _Database(self._collection)
+
+    def close(self):
+        pass
+
+
+class _AsyncQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def sort(self, *args, **kwargs):
+        self._query.sort(*args, **kwargs)
+        return self
+
+    async def to_list(self, length=None):
+        documents = list(self._query)
+        return documents if length is None else documents[:length]
+
+
+class _AsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return _AsyncQuery(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, *args, **kwargs):
+        return _AsyncQuery(self._collection.aggregate(*args, **kwargs))
+
+    async def create_index(self, *args, **kwargs):
+        return self._collection.create_index(*args, **kwargs)
+
+
+class AsyncRatingsClient(RatingsClient):
+    """Just enough of AsyncMongoClient for ratings.AsyncRatingsStore"""
+
+    def __getitem__(self, name):
+        return _Database(_AsyncCollection(self._collection))
+
+    async def close(self):
+        pass
+
+
+def seed(client, movies, users, ratings_per_user=20, seed=0):
+    """Fill client with movies (as returned by make_movies) and users' ratings"""
+    catalog = client.sample_mflix.movies
+    catalog.delete_many({})
+    catalog.insert_many([dict(movie, _id=ObjectId(movie["_id"])) for movie in movies])
+
+    ratings = client.ratings_db.ratings
+    ratings.delete_many({})
+    documents = make_ratings(movies, users, ratings_per_user, seed)
+    if documents:
+        ratings.insert_many(documents)
+    return len(documents)
+
+
+def install(movies=10000, users=1000, ratings_per_user=20, seed_value=0):
+    """Seed an in-memory server and route the recommender's clients to it"""
+    import ratings
+    import recommender
+
+    client = mongomock.MongoClient()
+    count = seed(client, make_movies(movies, seed_value), users, ratings_per_user, seed_value)
+    collection = RatingsCollection(client.ratings_db.ratings)
+    recommender.MongoClient = lambda *args, **kwargs: client
+    ratings.MongoClient = lambda *args, **kwargs: RatingsClient(collection)
+    ratings.AsyncMongoClient = lambda *args, **kwargs: AsyncRatingsClient(collection)
+    print(f"In-memory Mongo seeded with {movies} movies and {count} ratings from {users} users")
+    return client
@@ -0,0 +1,149 @@
+"""Local stand-in for the Movies GraphQL service.
+
+Answers the queries randommovies sends (films pages and lookups by _id,
+filmCount, filmsByIds and aliased films lookups) from a synthetic catalog,
+returning only the requested fields. It is not a GraphQL implementation:
+fragments, directives and nested arguments are not supported.
+
+    $ python benchmarks/fake_movies.py --movies 10000 --port 4100
+"""
+
+import argparse
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from catalog import make_movies
+
+TOKEN = re.compile(r"\([^()]*\)|[A-Za-z_][A-Za-z0-9_]*|[{}:]")
+
+
+def parse_selection(tokens, pos):
+    """Parse a {...} selection set starting at tokens[pos] == '{'.
+
+    Returns ([(alias, name, args, children)], next position).
+    """
+    fields = []
+    pos += 1
+    while tokens[pos] != "}":
+        alias = name = tokens[pos]
+        pos += 1
+        if tokens[pos] == ":":
+            name = tokens[pos + 1]
+            pos += 2
+        args = ""
+        if tokens[pos].startswith("("):
+            args = tokens[pos]
+            pos += 1
+        children = None
+        if tokens[pos] == "{":
+            children, pos = parse_selection(tokens, pos)
+        fields.append((alias, name, args, children))
+    return fields, pos + 1
+
+
+def parse_query(query):
+    tokens = TOKEN.findall(query)
+    return parse_selection(tokens, tokens.index("{"))[0]
+
+
+def project(value, children):
+    if children is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, children) for item in value]
+    return {alias: project(value.get(name), grandchildren) for alias, name, _, grandchildren in children}
+
+
+class FakeMoviesService:
+    def __init__(self, movies):
+        self.movies = movies
+        self.by_id = {movie["_id"]: movie for movie in movies}
+        self.requests = 0
+
+    def argument(self, args, name, variables, default=None):
+        match = re.search(rf"\b{name}\s*:\s*(\$?\w+)", args)
+        if not match:
+            return default
+        value = match.group(1)
+        if value.startswith("$"):
+            return variables.get(value[1:], default)
+        return int(value) if value.isdigit() else value
+
+    def resolve(self, name, args, variables):
+        if name == "filmCount":
+            return len(self.movies)
+        if name == "filmsByIds":
+            return [self.by_id[i] for i in variables.get("ids", []) if i in self.by_id]
+        if name == "films":
+            if "_id" in args:
+                movie_id = self.argument(args, "_id", variables)
+                return [self.by_id[movie_id]] if movie_id in self.by_id else []
+            limit = self.argument(args, "limit", variables, 10)
+            skip = self.argument(args, "skip", variables, 0)
+            return self.movies[skip:skip + limit]
+        raise ValueError(f"Unsupported field {name}")
+
+    def execute(self, query, variables):
+        self.requests += 1
+        data = {}
+        for alias, name, args, children in parse_query(query):
+            data[alias] = project(self.resolve(name, args, variables or {}), children)
+        return data
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; with Nagle on, keep-alive
+        # clients wait for a delayed ACK (~40 ms) on every call
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            try:
+                payload = {"data": service.execute(body["query"], body.get("variables"))}
+            except (ValueError, IndexError, KeyError) as e:
+                payload = {"errors": [{"message": str(e)}]}
+            self.reply(payload)
+
+        def do_GET(self):
+            self.reply({"movies": len(service.movies), "requests": service.requests})
+
+        def reply(self, payload):
+            out = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+    return Handler
+
+
+def start(movies, port=0):
+    """Serve movies in a background thread; returns (server, GraphQL url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(FakeMoviesService(movies)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/graphql"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movies", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=4100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(FakeMoviesService(make_movies(args.movies, args.seed))))
+    print(f"Fake Movies service with {args.movies} movies at http://127.0.0.1:{args.port}/graphql")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Drive every endpoint of a service and report latency, throughput and memory.
+
+    $ python benchmarks/load.py randommovies --movies 10000 --concurrency 16 --requests 500
+    $ python benchmarks/load.py recomendador --movies 10000 --users 1000 --concurrency 8
+
+The service is started with serve.py against the local stand-ins (or pass
+--url to hit one that is already running; its peak RSS is then not reported).
+Each endpoint gets one warmup request, so cold caches and model training are
+not part of the numbers, followed by --requests requests at --concurrency.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from catalog import object_id, user_email
+from common import LATENCY_HEADERS, latency_row, peak_rss_mb, print_table
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def randommovies_endpoints(args, rnd):
+    def movie_id():
+        return object_id(rnd.randrange(args.movies))
+
+    return {
+        "GET /": lambda: ("GET", "/", None),
+        "GET /random-movie": lambda: ("GET", "/random-movie", None),
+        "GET /random-movies/10": lambda: ("GET", "/random-movies/10", None),
+        "GET /random-movies/10?fields=summary": lambda: ("GET", "/random-movies/10?fields=summary", None),
+        "GET /top-movies/10": lambda: ("GET", "/top-movies/10", None),
+        "GET /top-movies/10?by=imdb.votes": lambda: ("GET", "/top-movies/10?by=imdb.votes", None),
+        "GET /movies?limit=100": lambda: ("GET", "/movies?limit=100", None),
+        "GET /movie/<id>": lambda: ("GET", f"/movie/{movie_id()}", None),
+        "GET /movies/batch?ids=<20 ids>": lambda: (
+            "GET", "/movies/batch?ids=" + ",".join(movie_id() for _ in range(20)), None),
+        "GET /cache-stats": lambda: ("GET", "/cache-stats", None),
+        "GET /metrics": lambda: ("GET", "/metrics", None),
+    }
+
+
+def recomendador_endpoints(args, rnd):
+    def email():
+        return user_email(rnd.randrange(args.users))
+
+    return {
+        "GET /recommend/<email>": lambda: ("GET", f"/recommend/{email()}", None),
+        "GET /recommend/<email>?mode=seed": lambda: ("GET", f"/recommend/{email()}?mode=seed", None),
+        "POST /recommend/batch (100 users)": lambda: (
+            "POST", "/recommend/batch", {"emails": [email() for _ in range(100)]}),
+        "GET /cache-stats": lambda: ("GET", "/cache-stats", None),
+        "GET /health": lambda: ("GET", "/health", None),
+        "GET /metrics": lambda: ("GET", "/metrics", None),
+    }
+
+
+def start_server(args):
+    command = [
+        sys.executable, os.path.join(HERE, "serve.py"), args.service,
+        "--movies", str(args.movies), "--users", str(args.users),
+        "--ratings-per-user", str(args.ratings_per_user),
+        "--port", str(args.port), "--seed", str(args.seed),
+    ]
+    if args.asgi:
+        command.append("--asgi")
+    return subprocess.Popen(command)
+
+
+def wait_until_ready(url, process, timeout):
+    """Poll url until it answers; recomendador is only ready once its model is trained"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=5).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+async def run_endpoint(client, make_request, requests, concurrency):
+    """Send requests built by make_request; returns (latencies, errors, elapsed)"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def send():
+        method, path, body = make_request()
+        started = time.perf_counter()
+        response = await client.request(method, path, json=body)
+        await response.aread()
+        return response.status_code, time.perf_counter() - started
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            try:
+                status, seconds = await send()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            else:
+                latencies.append(seconds)
+
+    # Warmup
+    await send()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run(args, base_url, endpoints):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    rows = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        for name, make_request in endpoints.items():
+            if args.only and args.only not in name:
+                continue
+            latencies, errors, elapsed = await run_endpoint(client, make_request, args.requests, args.concurrency)
+            rows.append(latency_row(name, latencies, errors, elapsed))
+            print(f"  {name}: done", file=sys.stderr)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=["randommovies", "recomendador"])
+    parser.add_argument("--movies", type=int, default=10000, help="catalog size")
+    parser.add_argument("--users", type=int, default=1000, help="users with ratings (recomendador)")
+    parser.add_argument("--ratings-per-user", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--only", help="only run endpoints whose name contains this")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--asgi", action="store_true", help="serve randommovies with uvicorn and asgi.py")
+    parser.add_argument("--url", help="benchmark an already running service at this base URL")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    if args.service == "randommovies":
+        endpoints, ready_path = randommovies_endpoints(args, rnd), "/"
+    else:
+        endpoints, ready_path = recomendador_endpoints(args, rnd), "/health/ready"
+
+    process = None if args.url else start_server(args)
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url + ready_path, process, args.startup_timeout)
+        rows = asyncio.run(run(args, base_url, endpoints))
+        rss = peak_rss_mb(process.pid) if process is not None else None
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"\n{args.service}: {args.movies} movies, concurrency {args.concurrency}, {args.requests} requests per endpoint")
+    print_table(LATENCY_HEADERS, rows)
+    if rss is not None:
+        print(f"server peak RSS: {rss:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Micro-benchmarks of the hot paths of each service, without HTTP in between.
+
+    $ python benchmarks/micro.py recomendador --movies 10000 --users 500
+    $ python benchmarks/micro.py randommovies --movies 10000
+
+recomendador: Recommender.train against the in-memory Mongo, then
+get_recommendations (by title) and get_user_recommendations (whole profile).
+randommovies: MovieManager._fetch_all_movies for each field set against the
+fake Movies service, with a fresh manager (cold cache) for every run.
+
+Both services have modules with the same names, so run one per process.
+"""
+
+import argparse
+import gc
+import os
+import random
+import time
+
+from catalog import make_movies, user_email
+from common import LATENCY_HEADERS, latency_row, peak_rss_mb, print_table, use_service
+
+
+def timed(function, repeat):
+    """Run function repeat times; returns (seconds per run, last result)"""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - started)
+    return seconds, result
+
+
+def bench_recomendador(args):
+    use_service("recomendador")
+    import fake_mongo
+    from ratings import RatingsStore
+    from recommender import Recommender
+
+    fake_mongo.install(args.movies, args.users, args.ratings_per_user, args.seed)
+    model = Recommender("mongodb://bench")
+    rows = []
+
+    seconds, _ = timed(model.train, args.train_repeat)
+    rows.append(latency_row("Recommender.train", seconds))
+
+    rnd = random.Random(args.seed)
+    titles = model.movies["title"].tolist()
+    seconds, _ = timed(lambda: model.get_recommendations(rnd.choice(titles)), args.repeat)
+    rows.append(latency_row("get_recommendations", seconds))
+
+    # Profiles come from the service's own query, as in GET /recommend/<email>
+    store = RatingsStore("mongodb://bench")
+    emails = [user_email(i) for i in range(args.users)]
+    users_ratings = store.get_users_ratings(emails)
+    profiles = [profile for profile in users_ratings.values() if profile] or [[]]
+    seconds, _ = timed(lambda: model.get_user_recommendations(rnd.choice(profiles)), args.repeat)
+    rows.append(latency_row("get_user_recommendations", seconds))
+
+    batch = {email: users_ratings[email] for email in emails[:100]}
+    seconds, _ = timed(lambda: list(model.get_batch_recommendations(batch)), max(1, args.repeat // 10))
+    rows.append(latency_row(f"get_batch_recommendations ({len(batch)} users)", seconds))
+    return rows
+
+
+def bench_randommovies(args):
+    import fake_movies
+
+    _, url = fake_movies.start(make_movies(args.movies, args.seed))
+    # Read by movies.py at import time
+    os.environ["MOVIES_URL"] = url
+    use_service("randommovies")
+    from movies import MovieManager
+    from transport import GraphQLTransport
+
+    transport = GraphQLTransport(url)
+    rows = []
+    for fields in args.fields:
+        seconds, movies = timed(lambda: MovieManager(transport=transport)._fetch_all_movies(fields), args.train_repeat)
+        if len(movies) != args.movies:
+            print(f"Warning: fetched {len(movies)} of {args.movies} movies with fields={fields}")
+        rows.append(latency_row(f"_fetch_all_movies({fields})", seconds))
+
+    manager = MovieManager(transport=transport)
+    manager.get_top_movies(10)
+    seconds, _ = timed(lambda: manager.get_top_movies(10), args.repeat)
+    rows.append(latency_row("get_top_movies (warm)", seconds))
+    seconds, _ = timed(lambda: manager.get_random_movies(10), args.repeat)
+    rows.append(latency_row("get_random_movies (warm)", seconds))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=["randommovies", "recomendador"])
+    parser.add_argument("--movies", type=int, default=10000, help="catalog size")
+    parser.add_argument("--users", type=int, default=500, help="users with ratings (recomendador)")
+    parser.add_argument("--ratings-per-user", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200, help="runs of each query benchmark")
+    parser.add_argument("--train-repeat", type=int, default=3, help="runs of train / full catalog fetches")
+    parser.add_argument("--fields", nargs="+", default=["ids", "ranking", "full"],
+                        help="field sets fetched by the randommovies benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.service == "randommovies":
+        rows = bench_randommovies(args)
+    else:
+        rows = bench_recomendador(args)
+
+    print(f"\n{args.service}: {args.movies} movies")
+    print_table(LATENCY_HEADERS, rows)
+    print(f"peak RSS: {peak_rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Run one of the Python services against the local stand-ins.
+
+    $ python benchmarks/serve.py randommovies --movies 10000 --port 5100 [--asgi]
+    $ python benchmarks/serve.py recomendador --movies 10000 --users 1000 --port 8100
+
+randommovies talks to an in-process fake Movies GraphQL service and
+recomendador to an in-memory Mongo; both are seeded with a synthetic catalog.
+"""
+
+import argparse
+import os
+import tempfile
+
+from common import use_service
+from catalog import make_movies
+
+
+def serve_randommovies(args):
+    import fake_movies
+
+    _, url = fake_movies.start(make_movies(args.movies, args.seed))
+    # Read by movies.py at import time
+    os.environ["MOVIES_URL"] = url
+    use_service("randommovies")
+
+    if args.asgi:
+        import uvicorn
+        import asgi
+
+        uvicorn.run(asgi.app, host="127.0.0.1", port=args.port, log_level="warning")
+    else:
+        import logging
+        from werkzeug.serving import run_simple
+        import app
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        run_simple("127.0.0.1", args.port, app.app, threaded=True)
+
+
+def serve_recomendador(args):
+    os.environ["MODEL_UPDATE_INTERVAL"] = "0"
+    os.environ["MODEL_RELOAD_INTERVAL"] = "0"
+    os.environ["MODEL_SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="recomendador-bench-")
+    use_service("recomendador")
+
+    import fake_mongo
+    import uvicorn
+
+    fake_mongo.install(args.movies, args.users, args.ratings_per_user, args.seed)
+    import main
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=["randommovies", "recomendador"])
+    parser.add_argument("--movies", type=int, default=10000, help="catalog size")
+    parser.add_argument("--users", type=int, default=1000, help="users with ratings (recomendador)")
+    parser.add_argument("--ratings-per-user", type=int, default=20, help="average ratings per user (recomendador)")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--asgi", action="store_true", help="serve randommovies with uvicorn and asgi.py")
+    args = parser.parse_args()
+
+    if args.service == "randommovies":
+        serve_randommovies(args)
+    else:
+        serve_recomendador(args)
+
+
+if __name__ == "__main__":
+    main()
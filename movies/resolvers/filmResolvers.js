@@ -1,34 +1,42 @@
 const Film = require('../models/Film');
 
+const buildFilmQuery = (filter = {}) => {
+  let query = {};
+
+  if (filter._id) {
+    query._id = filter._id;
+  }
+  if (filter.title) {
+    query.title = { $regex: filter.title, $options: 'i' };
+  }
+  if (filter.year) {
+    query.year = filter.year;
+  }
+  if (filter.genre) {
+    query.genres = { $in: [filter.genre] };
+  }
+  if (filter.director) {
+    query.directors = { $in: [new RegExp(filter.director, 'i')] };
+  }
+  if (filter.cast) {
+    query.cast = { $in: [new RegExp(filter.cast, 'i')] };
+  }
+
+  return query;
+};
+
 const resolvers = {
   Query: {
     films: async (_, { limit = 10, skip = 0, filter = {} }) => {
       try {
-        let query = {};
-        
-        if (filter._id) {
-          query._id = filter._id;
-        }
-        if (filter.title) {
-          query.title = { $regex: filter.title, $options: 'i' };
-        }
-        if (filter.year) {
-          query.year = filter.year;
-        }
-        if (filter.genre) {
-          query.genres = { $in: [filter.genre] };
-        }
-        if (filter.director) {
-          query.directors = { $in: [new RegExp(filter.director, 'i')] };
-        }
-        if (filter.cast) {
-          query.cast = { $in: [new RegExp(filter.cast, 'i')] };
-        }
+        const query = buildFilmQuery(filter);
 
+        // _id breaks ties between films of the same year so skip/limit
+        // pages are stable and never overlap
         let results = await Film.find(query)
           .limit(limit)
           .skip(skip)
-          .sort({ year: -1 });
+          .sort({ year: -1, _id: 1 });
 
         if(results.length === 1) {
           console.log(`Fetched ${JSON.stringify(results)} with filter: ${JSON.stringify(filter)}`);
@@ -40,6 +48,18 @@ const resolvers = {
       }
     },
 
+    filmCount: async (_, { filter = {} }) => {
+      try {
+        const query = buildFilmQuery(filter);
+        if (Object.keys(query).length === 0) {
+          return await Film.estimatedDocumentCount();
+        }
+        return await Film.countDocuments(query);
+      } catch (error) {
+        throw new Error('Error counting films: ' + error.message);
+      }
+    },
+
     film: async (_, { id }) => {
       try {
         const film = await Film.findById(id);
@@ -52,6 +72,14 @@ const resolvers = {
       }
     },
 
+    filmsByIds: async (_, { ids }) => {
+      try {
+        return await Film.find({ _id: { $in: ids } });
+      } catch (error) {
+        throw new Error('Error fetching films by IDs: ' + error.message);
+      }
+    },
+
     searchFilms: async (_, { title }) => {
       try {
         return await Film.find({
@@ -63,9 +63,15 @@ const typeDefs = gql`
       skip: Int
       filter: FilmFilter
     ): [Film]
+
+    # Count films matching an optional filter, without fetching them
+    filmCount(filter: FilmFilter): Int!
     
     # Get film by ID
     film(id: ID!): Film
+
+    # Get several films by ID in one query
+    filmsByIds(ids: [ID!]!): [Film]
     
     # Search films by title
     searchFilms(title: String!): [Film]
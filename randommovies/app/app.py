@@ -1,7 +1,17 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-from movies import MovieManager
+from prometheus_client import make_wsgi_app
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+from movies import MovieManager, FIELD_SETS, MAX_BATCH_IDS, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from local_movies import MOVIES_BACKEND, LocalMovieManager
+from ranking import RANKING_KEYS
+from endpoints import (
+    API_ENDPOINTS, INVALID_FIELDS_ERROR, INVALID_RANKING_ERROR, INVALID_BATCH_ERROR,
+    INVALID_LIMIT_ERROR, NDJSON_MIMETYPE, is_true, parse_batch_ids, wants_ndjson, ndjson_line,
+)
+import metrics
 import logging
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -9,31 +19,65 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
-movie_manager = MovieManager()
+movie_manager = LocalMovieManager() if MOVIES_BACKEND == "snapshot" else MovieManager()
+
+def get_fields_param():
+    """Get the requested field set name from ?fields=, or None if it is unknown"""
+    fields = request.args.get('fields', default='full')
+    return fields if fields in FIELD_SETS else None
+
+def get_sampling_params():
+    """Get the optional ?seed= and ?unique= random sampling parameters"""
+    seed = request.args.get('seed', default=None, type=int)
+    avoid_repeats = is_true(request.args.get('unique', default='false'))
+    return seed, avoid_repeats
+
+def invalid_fields_response():
+    return jsonify({"error": INVALID_FIELDS_ERROR}), 400
+
+def start_request_timer():
+    g.metrics_started = time.perf_counter()
+
+def record_request_metrics(response):
+    """Time the request by route template; streamed responses are timed to their first byte"""
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+        if response.content_length is not None:
+            metrics.RESPONSE_BYTES.labels(request.method, route).observe(response.content_length)
+    return response
+
+if metrics.METRICS_ENABLED:
+    app.before_request(start_request_timer)
+    app.after_request(record_request_metrics)
+
+metrics.CACHE_STATS.stats = movie_manager.get_cache_stats
+# GET /metrics is answered by prometheus_client's WSGI app
+app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {'/metrics': make_wsgi_app()})
 
 @app.route('/')
 def home():
     """Home endpoint with API information"""
-    all_ids = movie_manager.get_all_movie_ids()
+    first_ids, next_cursor, total = movie_manager.get_movie_ids_page(limit=DEFAULT_PAGE_LIMIT)
     return jsonify({
         "message": "Movie API",
-        "endpoints": {
-            "/random-movie": "GET - Get a random movie",
-            "/random-movies/<int:n>": "GET - Get N random movies",
-            "/top-movies/<int:n>": "GET - Get top N movies by rating",
-            "/random-movies": "GET - Get random movies with query parameter ?n=5",
-            "/movie/<int:movie_id>": "GET - Get a specific movie by ID",
-            "/movies": "GET - Get all available movie IDs"
-        },
-        "total_movies": movie_manager.get_movie_count(),
-        "available_movie_ids": all_ids
+        "endpoints": API_ENDPOINTS,
+        "total_movies": total,
+        "available_movie_ids": first_ids,
+        "next_cursor": next_cursor
     })
 
 @app.route('/random-movie', methods=['GET'])
 def random_movie():
     """Get a single random movie"""
     try:
-        movie = movie_manager.get_random_movie()
+        fields = get_fields_param()
+        if fields is None:
+            return invalid_fields_response()
+        
+        seed, avoid_repeats = get_sampling_params()
+        movie = movie_manager.get_random_movie(fields, seed=seed, avoid_repeats=avoid_repeats)
         if not movie:
             return jsonify({"error": "No movies available"}), 404
         
@@ -56,7 +100,12 @@ def random_n_movies(n=None):
         if n <= 0:
             return jsonify({"error": "Parameter 'n' must be positive"}), 400
         
-        movies = movie_manager.get_random_movies(n)
+        fields = get_fields_param()
+        if fields is None:
+            return invalid_fields_response()
+        
+        seed, avoid_repeats = get_sampling_params()
+        movies = movie_manager.get_random_movies(n, fields, seed=seed, avoid_repeats=avoid_repeats)
         
         logger.info(f"Returning {len(movies)} random movies")
         return jsonify({
@@ -80,7 +129,15 @@ def top_n_movies(n=None):
         if n <= 0:
             return jsonify({"error": "Parameter 'n' must be positive"}), 400
         
-        movies = movie_manager.get_top_movies(n)
+        fields = get_fields_param()
+        if fields is None:
+            return invalid_fields_response()
+        
+        by = request.args.get('by', default='imdb.rating')
+        if by not in RANKING_KEYS:
+            return jsonify({"error": INVALID_RANKING_ERROR}), 400
+        
+        movies = movie_manager.get_top_movies(n, fields, by=by)
         
         logger.info(f"Returning top {len(movies)} movies by rating")
         return jsonify({
@@ -94,13 +151,28 @@ def top_n_movies(n=None):
 
 @app.route('/movies', methods=['GET'])
 def get_all_movie_ids():
-    """Get all available movie IDs"""
+    """Get available movie IDs, one page at a time or as an NDJSON stream"""
     try:
-        movie_ids = movie_manager.get_all_movie_ids()
+        if wants_ndjson(request.args.get('format'), request.headers.get('Accept')):
+            logger.info("Streaming movie IDs as NDJSON")
+            lines = (ndjson_line(movie_id) for movie_id in movie_manager.iter_movie_ids())
+            return Response(stream_with_context(lines), mimetype=NDJSON_MIMETYPE)
+        
+        limit = request.args.get('limit', default=DEFAULT_PAGE_LIMIT, type=int)
+        if not 0 < limit <= MAX_PAGE_LIMIT:
+            return jsonify({"error": INVALID_LIMIT_ERROR}), 400
+        
+        try:
+            movie_ids, next_cursor, total = movie_manager.get_movie_ids_page(request.args.get('cursor'), limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         logger.info(f"Returning {len(movie_ids)} movie IDs")
         return jsonify({
-            "total_movie_ids": len(movie_ids),
-            "movie_ids": movie_ids
+            "total_movie_ids": total,
+            "count": len(movie_ids),
+            "movie_ids": movie_ids,
+            "next_cursor": next_cursor
         })
     
     except Exception as e:
@@ -113,13 +185,14 @@ def get_movie_by_id(movie_id=None):
     try:
         logger.info(f"Request for movie with ID: {movie_id}")
         
-        movie = movie_manager.get_movie_by_id(movie_id)
+        fields = get_fields_param()
+        if fields is None:
+            return invalid_fields_response()
+        
+        movie = movie_manager.get_movie_by_id(movie_id, fields)
         
         if not movie:
-            return jsonify({
-                "error": f"Movie with ID {movie_id} not found",
-                "available_ids": movie_manager.get_all_movie_ids()
-            }), 404
+            return jsonify({"error": f"Movie with ID {movie_id} not found"}), 404
         
         logger.info(f"Returning movie: {movie.get('title', 'Unknown')} (ID: {movie_id})")
         return jsonify(movie)
@@ -128,6 +201,37 @@ def get_movie_by_id(movie_id=None):
         logger.error(f"Error in get_movie_by_id: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/movies/batch', methods=['GET', 'POST'])
+def get_movies_batch():
+    """Get several movies by ID with a single upstream query"""
+    try:
+        body = request.get_json(silent=True) if request.method == 'POST' else None
+        movie_ids = parse_batch_ids(request.args.get('ids'), body)
+        if not movie_ids or len(movie_ids) > MAX_BATCH_IDS:
+            return jsonify({"error": INVALID_BATCH_ERROR}), 400
+        
+        fields = get_fields_param()
+        if fields is None:
+            return invalid_fields_response()
+        
+        movies, not_found = movie_manager.get_movies_by_ids(movie_ids, fields)
+        
+        logger.info(f"Returning {len(movies)} movies for a batch of {len(movie_ids)} IDs")
+        return jsonify({
+            "count": len(movies),
+            "movies": movies,
+            "not_found": not_found
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in get_movies_batch: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Get catalog cache hit/miss/refresh counters"""
+    return jsonify(movie_manager.get_cache_stats())
+
 
 @app.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,235 @@
+"""ASGI serving mode for the Random Movies service.
+
+Same endpoints and responses as app.py, backed by AsyncMovieManager so that
+requests waiting on the Movies service share one event loop instead of each
+holding a worker thread. Run it with
+
+    $ uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+from typing import Optional
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from prometheus_client import REGISTRY
+from prometheus_client.exposition import choose_encoder
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from async_movies import AsyncMovieManager
+from local_movies import MOVIES_BACKEND, AsyncLocalMovieManager
+from movies import FIELD_SETS, MAX_BATCH_IDS, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from ranking import RANKING_KEYS
+from endpoints import (
+    API_ENDPOINTS, INVALID_FIELDS_ERROR, INVALID_RANKING_ERROR, INVALID_BATCH_ERROR,
+    INVALID_LIMIT_ERROR, NDJSON_MIMETYPE, is_true, parse_batch_ids, wants_ndjson, ndjson_line,
+)
+import metrics
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Random Movies Microservice")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, duration=metrics.REQUEST_SECONDS, size=metrics.RESPONSE_BYTES)
+
+movie_manager = AsyncLocalMovieManager() if MOVIES_BACKEND == "snapshot" else AsyncMovieManager()
+
+metrics.CACHE_STATS.stats = movie_manager.get_cache_stats
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await movie_manager.close()
+
+def error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+@app.get('/')
+async def home():
+    """Home endpoint with API information"""
+    first_ids, next_cursor, total = await movie_manager.get_movie_ids_page(limit=DEFAULT_PAGE_LIMIT)
+    return {
+        "message": "Movie API",
+        "endpoints": API_ENDPOINTS,
+        "total_movies": total,
+        "available_movie_ids": first_ids,
+        "next_cursor": next_cursor
+    }
+
+@app.get('/random-movie')
+async def random_movie(fields: str = 'full', seed: Optional[int] = None, unique: str = 'false'):
+    """Get a single random movie"""
+    try:
+        if fields not in FIELD_SETS:
+            return error(INVALID_FIELDS_ERROR, 400)
+
+        movie = await movie_manager.get_random_movie(fields, seed=seed, avoid_repeats=is_true(unique))
+        if not movie:
+            return error("No movies available", 404)
+
+        logger.info(f"Returning random movie: {movie.get('title', 'Unknown')}")
+        return movie
+
+    except Exception as e:
+        logger.error(f"Error in random_movie: {str(e)}")
+        return error("Internal server error", 500)
+
+# As with Flask's <int:n>, a path that is not a count is a 404, not a 422
+@app.get('/random-movies')
+@app.get('/random-movies/{n:int}')
+async def random_n_movies(n: int = 5, fields: str = 'full', seed: Optional[int] = None, unique: str = 'false'):
+    """Get N random movies"""
+    try:
+        if n <= 0:
+            return error("Parameter 'n' must be positive", 400)
+
+        if fields not in FIELD_SETS:
+            return error(INVALID_FIELDS_ERROR, 400)
+
+        movies = await movie_manager.get_random_movies(n, fields, seed=seed, avoid_repeats=is_true(unique))
+
+        logger.info(f"Returning {len(movies)} random movies")
+        return {
+            "count": len(movies),
+            "movies": movies
+        }
+
+    except Exception as e:
+        logger.error(f"Error in random_n_movies: {str(e)}")
+        return error("Internal server error", 500)
+
+@app.get('/top-movies')
+@app.get('/top-movies/{n:int}')
+async def top_n_movies(n: int = 5, fields: str = 'full', by: str = 'imdb.rating'):
+    """Get top N movies by rating"""
+    try:
+        if n <= 0:
+            return error("Parameter 'n' must be positive", 400)
+
+        if fields not in FIELD_SETS:
+            return error(INVALID_FIELDS_ERROR, 400)
+
+        if by not in RANKING_KEYS:
+            return error(INVALID_RANKING_ERROR, 400)
+
+        movies = await movie_manager.get_top_movies(n, fields, by=by)
+
+        logger.info(f"Returning top {len(movies)} movies by rating")
+        return {
+            "count": len(movies),
+            "movies": movies
+        }
+
+    except Exception as e:
+        logger.error(f"Error in top_n_movies: {str(e)}")
+        return error("Internal server error", 500)
+
+@app.get('/movies')
+async def get_all_movie_ids(request: Request, limit: int = DEFAULT_PAGE_LIMIT,
+                            cursor: Optional[str] = None, format: Optional[str] = None):
+    """Get available movie IDs, one page at a time or as an NDJSON stream"""
+    try:
+        if wants_ndjson(format, request.headers.get('accept')):
+            logger.info("Streaming movie IDs as NDJSON")
+
+            async def lines():
+                async for movie_id in movie_manager.iter_movie_ids():
+                    yield ndjson_line(movie_id)
+
+            return StreamingResponse(lines(), media_type=NDJSON_MIMETYPE)
+
+        if not 0 < limit <= MAX_PAGE_LIMIT:
+            return error(INVALID_LIMIT_ERROR, 400)
+
+        try:
+            movie_ids, next_cursor, total = await movie_manager.get_movie_ids_page(cursor, limit)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        logger.info(f"Returning {len(movie_ids)} movie IDs")
+        return {
+            "total_movie_ids": total,
+            "count": len(movie_ids),
+            "movie_ids": movie_ids,
+            "next_cursor": next_cursor
+        }
+
+    except Exception as e:
+        logger.error(f"Error in get_all_movie_ids: {str(e)}")
+        return error("Internal server error", 500)
+
+@app.api_route('/movies/batch', methods=['GET', 'POST'])
+async def get_movies_batch(request: Request, ids: Optional[str] = None, fields: str = 'full'):
+    """Get several movies by ID with a single upstream query"""
+    try:
+        body = None
+        if request.method == 'POST':
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+        movie_ids = parse_batch_ids(ids, body)
+        if not movie_ids or len(movie_ids) > MAX_BATCH_IDS:
+            return error(INVALID_BATCH_ERROR, 400)
+
+        if fields not in FIELD_SETS:
+            return error(INVALID_FIELDS_ERROR, 400)
+
+        movies, not_found = await movie_manager.get_movies_by_ids(movie_ids, fields)
+
+        logger.info(f"Returning {len(movies)} movies for a batch of {len(movie_ids)} IDs")
+        return {
+            "count": len(movies),
+            "movies": movies,
+            "not_found": not_found
+        }
+
+    except Exception as e:
+        logger.error(f"Error in get_movies_batch: {str(e)}")
+        return error("Internal server error", 500)
+
+@app.get('/movie/{movie_id}')
+async def get_movie_by_id(movie_id: str, fields: str = 'full'):
+    """Get a specific movie by ID"""
+    try:
+        logger.info(f"Request for movie with ID: {movie_id}")
+
+        if fields not in FIELD_SETS:
+            return error(INVALID_FIELDS_ERROR, 400)
+
+        movie = await movie_manager.get_movie_by_id(movie_id, fields)
+
+        if not movie:
+            return error(f"Movie with ID {movie_id} not found", 404)
+
+        logger.info(f"Returning movie: {movie.get('title', 'Unknown')} (ID: {movie_id})")
+        return movie
+
+    except Exception as e:
+        logger.error(f"Error in get_movie_by_id: {str(e)}")
+        return error("Internal server error", 500)
+
+@app.get('/cache-stats')
+async def cache_stats():
+    """Get catalog cache hit/miss/refresh counters"""
+    return movie_manager.get_cache_stats()
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics_endpoint(request: Request):
+    """Get metrics in the Prometheus text format"""
+    # The exposition format the scraper asks for, as prometheus_client's own apps do
+    encoder, content_type = choose_encoder(request.headers.get("accept"))
+    return Response(encoder(REGISTRY), media_type=content_type)
+
+@app.exception_handler(StarletteHTTPException)
+async def http_error(request: Request, exc: StarletteHTTPException):
+    if exc.status_code == 404:
+        return error("Endpoint not found", 404)
+    return error(str(exc.detail), exc.status_code)
@@ -0,0 +1,213 @@
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from cache import AsyncCatalogCache
+from singleflight import AsyncSingleFlight
+from ranking import RatingIndex
+from transport import AsyncGraphQLTransport, GraphQLError
+from movies import (
+    MovieManager, apiUrl, COUNT_QUERY, ID_PAGE_QUERY, films_page_query, films_by_ids_query,
+    aliased_films_query, aliased_films_variables, aliased_films, film_by_id_query,
+    join_pages, ids_of, id_index, page_at_cursor, in_request_order, TOP_INDEX_DEPTH, DEFAULT_PAGE_LIMIT,
+)
+
+class AsyncMovieManager(MovieManager):
+    """asyncio version of MovieManager for the ASGI serving mode (asgi.py).
+
+    Exposes the same public methods as coroutines. Only the methods that wait
+    on the Movies service are overridden; caching, sampling, ranking and page
+    assembly are MovieManager's, and upstream calls go through a non-blocking
+    AsyncGraphQLTransport.
+    """
+
+    transport_class = AsyncGraphQLTransport
+    catalog_cache_class = AsyncCatalogCache
+    flights_class = AsyncSingleFlight
+
+    async def close(self) -> None:
+        """Release the upstream connection pool"""
+        await self.transport.close()
+
+    async def _fetch_movies_from_api(self, limit: int = 100, skip: int = 0, fields: str = "full") -> List[Dict[str, Any]]:
+        return await self.flights.do(("page", fields, limit, skip),
+                                     lambda: self._request_movies_page(limit, skip, fields))
+
+    async def _request_movies_page(self, limit: int, skip: int, fields: str) -> List[Dict[str, Any]]:
+        if not apiUrl:
+            print("Warning: MOVIES_URL environment variable not set.")
+            return []
+
+        data = await self.transport.execute(films_page_query(fields), {"limit": limit, "skip": skip})
+        return data.get("films") or []
+
+    async def _get_total_movie_count(self) -> int:
+        return await self.flights.do(("count",), self._request_movie_count)
+
+    async def _request_movie_count(self) -> int:
+        if not apiUrl:
+            return 0
+
+        try:
+            data = await self.transport.execute(COUNT_QUERY)
+            return int(data.get("filmCount") or 0)
+        except GraphQLError as e:
+            # Older Movies services have no filmCount query
+            print(f"filmCount not available, counting movie IDs instead: {e}")
+            return await self._count_movies_by_ids()
+        except Exception as e:
+            print(f"Error fetching movie count: {e}")
+            return 0
+
+    async def _count_movies_by_ids(self, batch_size: int = 1000) -> int:
+        total = 0
+        try:
+            while True:
+                data = await self.transport.execute(ID_PAGE_QUERY, {"limit": batch_size, "skip": total})
+                films = data.get("films") or []
+                total += len(films)
+                if len(films) < batch_size:
+                    return total
+        except Exception as e:
+            print(f"Error counting movies: {e}")
+            return total
+
+    async def _fetch_all_movies(self, fields: str = "full") -> List[Dict[str, Any]]:
+        return await self.flights.do(("catalog", fields), lambda: self._load_all_movies(fields))
+
+    async def _load_all_movies(self, fields: str) -> List[Dict[str, Any]]:
+        total_count = await self._get_total_movie_count()
+
+        if total_count == 0:
+            return []
+
+        batch_size = self.page_size
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+        async def fetch_page(skip: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self._fetch_movies_from_api(limit=batch_size, skip=skip, fields=fields)
+
+        # gather() returns pages in skip order, whatever order they complete in
+        pages = await asyncio.gather(*(fetch_page(skip) for skip in range(0, total_count, batch_size)))
+        return join_pages(pages, total_count)
+
+    async def _request_movies_by_ids(self, movie_ids: List[str], fields: str) -> List[Dict[str, Any]]:
+        try:
+            data = await self.transport.execute(films_by_ids_query(fields), {"ids": list(movie_ids)})
+            return data.get("filmsByIds") or []
+        except GraphQLError as e:
+            # Older Movies services have no filmsByIds query
+            print(f"filmsByIds not available, using aliased lookups instead: {e}")
+            data = await self.transport.execute(aliased_films_query(len(movie_ids), fields),
+                                                aliased_films_variables(movie_ids))
+            return aliased_films(data)
+
+    async def _fetch_movies_by_ids(self, movie_ids: List[str], fields: str = "full") -> List[Dict[str, Any]]:
+        try:
+            movies, _ = await self.get_movies_by_ids(movie_ids, fields)
+            return movies
+        except Exception as e:
+            print(f"Error fetching movies by IDs: {e}")
+            return []
+
+    async def _get_id_index(self) -> Tuple[str, ...]:
+        async def load():
+            return id_index(await self._fetch_all_movies("ids"))
+
+        return await self.catalog_cache.get("id-index", load)
+
+    async def get_random_movies(self, n: int = 5, fields: str = "full", seed: Optional[int] = None,
+                                avoid_repeats: bool = False) -> List[Dict[str, Any]]:
+        """Get N random movies"""
+        if n <= 0:
+            return []
+
+        movie_ids = self.sampler.sample(await self._get_id_index(), n, seed=seed, avoid_repeats=avoid_repeats)
+        return await self._fetch_movies_by_ids(movie_ids, fields)
+
+    async def get_random_movie(self, fields: str = "full", seed: Optional[int] = None,
+                               avoid_repeats: bool = False) -> Dict[str, Any]:
+        """Get a single random movie"""
+        movies = await self.get_random_movies(1, fields, seed=seed, avoid_repeats=avoid_repeats)
+        return movies[0] if movies else {}
+
+    async def _get_rating_index(self) -> RatingIndex:
+        async def load():
+            movies = await self._fetch_all_movies("ranking")
+            if not movies:
+                return None
+            # Building the index is CPU bound; keep it off the event loop
+            return await asyncio.to_thread(RatingIndex, movies, depth=TOP_INDEX_DEPTH)
+
+        return await self.catalog_cache.get("rating-index", load, sizeof=lambda index: index.approximate_size())
+
+    async def get_top_movies(self, n: int = 5, fields: str = "full", by: str = "imdb.rating") -> List[Dict[str, Any]]:
+        """Get top N movies based on rating (or another ranking key)"""
+        if n <= 0:
+            return []
+
+        index = await self._get_rating_index()
+        if not index:
+            return []
+
+        top = index.top_n(by, n)
+        return await self._fetch_movies_by_ids([movie_id for _, movie_id in top], fields)
+
+    async def get_movie_count(self) -> int:
+        """Get total number of movies in database"""
+        return await self._get_total_movie_count()
+
+    async def get_movie_by_id(self, movie_id: str, fields: str = "full") -> Optional[Dict[str, Any]]:
+        """Get a movie by its MongoDB _id"""
+        found, movie = self._cached_movie(movie_id, fields)
+        if found:
+            return movie
+
+        try:
+            films = await self.flights.do(("movie", movie_id, fields),
+                                          lambda: self._request_movie_by_id(movie_id, fields))
+            movie = films[0] if films else None
+        except GraphQLError as e:
+            print(e)
+            return None
+        except Exception as e:
+            print(f"Error fetching movie by ID: {e}")
+            return None
+
+        self.movie_cache.put((movie_id, fields), movie)
+        return movie
+
+    async def _request_movie_by_id(self, movie_id: str, fields: str) -> List[Dict[str, Any]]:
+        data = await self.transport.execute(film_by_id_query(fields), {"id": movie_id})
+        return data.get("films") or []
+
+    async def get_movies_by_ids(self, movie_ids: List[str], fields: str = "full") -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Get several movies by _id with at most one upstream query; see MovieManager.get_movies_by_ids"""
+        unique_ids = list(dict.fromkeys(movie_ids))
+        movies, missing = self._cached_movies(unique_ids, fields)
+
+        if missing and apiUrl:
+            films = await self.flights.do(("movies", tuple(missing), fields),
+                                          lambda: self._request_movies_by_ids(missing, fields))
+            self._cache_fetched(missing, films, fields, movies)
+
+        return in_request_order(unique_ids, movies)
+
+    async def get_all_movie_ids(self) -> List[str]:
+        """Get list of all available movie IDs"""
+        return list(await self._get_id_index())
+
+    async def get_movie_ids_page(self, cursor: Optional[str] = None,
+                                 limit: int = DEFAULT_PAGE_LIMIT) -> Tuple[List[str], Optional[str], int]:
+        """Get one page of movie IDs; see MovieManager.get_movie_ids_page"""
+        return page_at_cursor(await self._get_id_index(), cursor, limit)
+
+    async def iter_movie_ids(self) -> AsyncIterator[str]:
+        """Yield every movie ID as upstream pages arrive; see MovieManager.iter_movie_ids"""
+        skip = 0
+        while True:
+            movies = await self._fetch_movies_from_api(limit=self.page_size, skip=skip, fields="ids")
+            for movie_id in ids_of(movies):
+                yield movie_id
+            if len(movies) < self.page_size:
+                return
+            skip += self.page_size
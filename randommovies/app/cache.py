@@ -0,0 +1,265 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+# Also in recomendador/cache.py; the services cannot share code across their
+# Docker build contexts
+def estimate_size(value: Any) -> int:
+    """Rough size in bytes of a JSON-like value (its serialized length)"""
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _Entry:
+    __slots__ = ("value", "loaded_at", "size")
+
+    def __init__(self, value: Any, loaded_at: float, size: int):
+        self.value = value
+        self.loaded_at = loaded_at
+        self.size = size
+
+
+class CatalogCache:
+    """TTL cache with stale-while-revalidate refresh and a memory cap.
+
+    Fresh entries are served directly. Entries older than ``ttl`` are still
+    served while a single background thread reloads them, until they are older
+    than ``ttl + max_stale``; past that point callers load synchronously.
+    Least recently used entries are evicted once the estimated size of all
+    entries exceeds ``max_bytes``.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_stale: float = 3600.0,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 sizeof: Callable[[Any], int] = estimate_size):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key: Hashable, loader: Callable[[], Any],
+            sizeof: Optional[Callable[[Any], int]] = None) -> Any:
+        """Return the cached value for key, loading it with loader if needed.
+
+        sizeof overrides the size estimate for values that are not JSON-like.
+        """
+        found, value = self._lookup(key, loader, sizeof)
+        if found:
+            return value
+
+        value = loader()
+        self._store(key, value, sizeof)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the cache counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+            stats["ttl"] = self.ttl
+        return stats
+
+    def _lookup(self, key: Hashable, loader: Callable[[], Any],
+                sizeof: Optional[Callable[[Any], int]]) -> Tuple[bool, Any]:
+        # Returns (True, value) for fresh and servable stale entries, scheduling
+        # a refresh for the latter, and (False, None) on a miss
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.loaded_at
+                if age <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return True, entry.value
+                if age <= self.ttl + self.max_stale:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._schedule_refresh(key, loader, sizeof)
+                    return True, entry.value
+            self._stats["misses"] += 1
+        return False, None
+
+    def _schedule_refresh(self, key: Hashable, loader: Callable[[], Any],
+                          sizeof: Optional[Callable[[Any], int]]) -> None:
+        thread = threading.Thread(
+            target=self._refresh, args=(key, loader, sizeof),
+            name=f"catalog-cache-refresh-{key}", daemon=True
+        )
+        thread.start()
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any],
+                 sizeof: Optional[Callable[[Any], int]]) -> None:
+        try:
+            self._finish_refresh(key, loader(), sizeof)
+        except Exception as e:
+            self._fail_refresh(key, e)
+
+    def _finish_refresh(self, key: Hashable, value: Any,
+                        sizeof: Optional[Callable[[Any], int]]) -> None:
+        stored = self._store(key, value, sizeof)
+        with self._lock:
+            self._stats["refreshes" if stored else "refresh_errors"] += 1
+            self._refreshing.discard(key)
+
+    def _fail_refresh(self, key: Hashable, error: Exception) -> None:
+        print(f"Error refreshing cache entry {key}: {error}")
+        with self._lock:
+            self._stats["refresh_errors"] += 1
+            self._refreshing.discard(key)
+
+    def _store(self, key: Hashable, value: Any,
+               sizeof: Optional[Callable[[Any], int]] = None) -> bool:
+        # Empty results usually mean the upstream failed; never cache them so
+        # the next request retries instead of serving nothing for a whole TTL.
+        if not value:
+            return False
+
+        size = (sizeof or self._sizeof)(value)
+        if size > self.max_bytes:
+            print(f"Warning: cache entry {key} ({size} bytes) exceeds max_bytes, not cached.")
+            return False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = _Entry(value, time.monotonic(), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats["evictions"] += 1
+        return True
+
+
+class AsyncCatalogCache(CatalogCache):
+    """CatalogCache for asyncio code: loaders are coroutine functions and
+    stale entries are refreshed by a background task on the running loop."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tasks: set = set()
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                  sizeof: Optional[Callable[[Any], int]] = None) -> Any:
+        """Return the cached value for key, awaiting loader if needed"""
+        found, value = self._lookup(key, loader, sizeof)
+        if found:
+            return value
+
+        value = await loader()
+        self._store(key, value, sizeof)
+        return value
+
+    def _schedule_refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          sizeof: Optional[Callable[[Any], int]]) -> None:
+        task = asyncio.get_running_loop().create_task(self._refresh(key, loader, sizeof))
+        # Keep a reference so the task is not garbage collected mid-refresh
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                       sizeof: Optional[Callable[[Any], int]]) -> None:
+        try:
+            self._finish_refresh(key, await loader(), sizeof)
+        except Exception as e:
+            self._fail_refresh(key, e)
+
+
+class LRUCache:
+    """Bounded LRU cache with optional negative caching.
+
+    ``put(key, None)`` records that key does not exist; it is remembered for
+    ``negative_ttl`` seconds (0 disables negative caching) while regular
+    entries live for ``ttl`` seconds.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0, negative_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (True, value) on a hit, value being None for known-missing keys, else (False, None)"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                value, expires_at = item
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self._stats["hits" if value is not None else "negative_hits"] += 1
+                    return True, value
+                del self._entries[key]
+            self._stats["misses"] += 1
+        return False, None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value for key; None stores a negative entry"""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the cache counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+        return stats
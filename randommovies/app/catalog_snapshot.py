@@ -0,0 +1,312 @@
+"""Versioned on-disk snapshots of the movie catalog, for the local backend.
+
+A snapshot directory looks like
+
+    <directory>/
+        LATEST                      # name of the newest complete snapshot
+        20250101T120000.000000000-1234/
+            meta.json               # format, version, creation time, source and movie count
+            ids.txt                 # one movie _id per line, sorted
+            documents.jsonl         # one compact JSON document per line ("full" field set)
+            offsets.bin             # array('Q') of count + 1 byte offsets into documents.jsonl
+            <ranking key>.bin       # array('d') per RANKING_KEYS entry, NaN when missing
+
+Documents are memory-mapped and located through the offsets, so reading one
+movie decodes just its own line. Snapshots are written to a temporary
+directory and renamed into place, and LATEST is replaced atomically, so
+readers never see a partial snapshot.
+
+_write_atomic, exclusive_lock, new_version, latest_version and
+prune_snapshots are recomendador/snapshot.py's, with type hints added: the
+service's Docker build context is randommovies/app, so it cannot import them.
+Keep the two copies in step.
+"""
+
+import fcntl
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from movies import FIELD_SETS
+from ranking import RANKING_KEYS, RatingIndex, get_path
+
+# Bump when the snapshot layout changes incompatibly
+SNAPSHOT_FORMAT = 1
+LATEST_FILE = "LATEST"
+META_FILE = "meta.json"
+IDS_FILE = "ids.txt"
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "offsets.bin"
+LOCK_FILE = ".lock"
+
+# Selection tree of a GraphQL field set: {field: None, or the tree of its subfields}
+Selection = Dict[str, Optional["Selection"]]
+
+SELECTION_TOKEN = re.compile(r"[A-Za-z_]\w*|[{}]")
+
+
+def parse_selection(fields: str) -> Selection:
+    """Selection tree of a GraphQL selection set such as FIELD_SETS['summary']"""
+    tokens = SELECTION_TOKEN.findall(fields)
+    stack: List[Selection] = [{}]
+    last = None
+    for token in tokens:
+        if token == "{":
+            stack[-1][last] = {}
+            stack.append(stack[-1][last])
+        elif token == "}":
+            stack.pop()
+        else:
+            stack[-1][token] = None
+            last = token
+    return stack[0]
+
+
+# Parsed once; documents are projected on them the way GraphQL would resolve the query
+SELECTIONS: Dict[str, Selection] = {name: parse_selection(fields) for name, fields in FIELD_SETS.items()}
+
+
+def project(document: Any, selection: Selection) -> Any:
+    """Keep only the selected fields of document; missing fields are None, as in GraphQL"""
+    if isinstance(document, list):
+        return [project(item, selection) for item in document]
+    if not isinstance(document, dict):
+        return None
+    projected = {}
+    for field, subselection in selection.items():
+        value = document.get(field)
+        projected[field] = value if subselection is None or value is None else project(value, subselection)
+    return projected
+
+
+def from_seed_movie(movie: Dict[str, Any]) -> Dict[str, Any]:
+    """Movie document for an entry of data/movies.json, which predates the mflix schema"""
+    def as_list(value: Any) -> Optional[List[Any]]:
+        if value is None:
+            return None
+        return value if isinstance(value, list) else [value]
+
+    rating = movie.get("rating")
+    return {
+        "_id": str(movie.get("id")),
+        "title": movie.get("title"),
+        "poster": movie.get("poster"),
+        "year": movie.get("year"),
+        "runtime": movie.get("duration"),
+        "directors": as_list(movie.get("director")),
+        "cast": movie.get("cast"),
+        "plot": movie.get("short_plot"),
+        "fullplot": movie.get("long_plot"),
+        "countries": as_list(movie.get("country")),
+        "languages": as_list(movie.get("original_language")),
+        "imdb": {"rating": rating} if rating is not None else None,
+    }
+
+
+def load_seed_movies(path: str) -> List[Dict[str, Any]]:
+    """Movie documents of a seed file in the data/movies.json format"""
+    with open(path) as f:
+        movies = json.load(f)
+    return [from_seed_movie(movie) for movie in movies if movie.get("id") is not None]
+
+
+def _write_atomic(path: str, data: str) -> None:
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def exclusive_lock(directory: str) -> Iterator[None]:
+    """Hold an exclusive lock on directory, shared by every process on the host"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def new_version() -> str:
+    """Snapshot version name; sorts by creation time"""
+    now = time.time_ns()
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(now // 10**9))
+    return f"{stamp}.{now % 10**9:09d}-{os.getpid()}"
+
+
+def latest_version(directory: str) -> Optional[str]:
+    """Name of the newest complete snapshot in directory, or None"""
+    try:
+        with open(os.path.join(directory, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def read_meta(directory: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """meta.json of a snapshot, the latest one by default, or None if it cannot be used"""
+    version = version or latest_version(directory)
+    if not version:
+        return None
+    try:
+        with open(os.path.join(directory, version, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read catalog snapshot {version}: {e}")
+        return None
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        print(f"Catalog snapshot {version} has format {meta.get('format')}, expected {SNAPSHOT_FORMAT}")
+        return None
+    return meta
+
+
+def save_catalog(directory: str, movies: Iterable[Dict[str, Any]], source: str, keep: int = 3) -> str:
+    """Write a new snapshot of movies, point LATEST to it and return its version.
+
+    Movies are stored sorted by _id, as the id listing pages by keyset.
+    Movies without an _id and repeated ids are skipped. Only the newest keep
+    snapshots are kept.
+    """
+    os.makedirs(directory, exist_ok=True)
+    version = new_version()
+    tmp_dir = os.path.join(directory, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+    try:
+        ids: List[str] = []
+        seen = set()
+        offsets = array("Q", [0])
+        columns = {key: array("d") for key in RANKING_KEYS}
+        with open(os.path.join(tmp_dir, DOCUMENTS_FILE), "wb") as documents:
+            movies = sorted((movie for movie in movies if movie.get("_id") is not None),
+                            key=lambda movie: str(movie["_id"]))
+            for movie in movies:
+                movie_id = str(movie["_id"])
+                if movie_id in seen:
+                    continue
+                seen.add(movie_id)
+                ids.append(movie_id)
+                line = json.dumps(dict(movie, _id=movie_id), separators=(",", ":")).encode() + b"\n"
+                documents.write(line)
+                offsets.append(offsets[-1] + len(line))
+                for key in RANKING_KEYS:
+                    value = get_path(movie, key)
+                    columns[key].append(math.nan if value is None else value)
+
+        with open(os.path.join(tmp_dir, IDS_FILE), "w") as f:
+            f.write("".join(f"{movie_id}\n" for movie_id in ids))
+        with open(os.path.join(tmp_dir, OFFSETS_FILE), "wb") as f:
+            offsets.tofile(f)
+        for key, column in columns.items():
+            with open(os.path.join(tmp_dir, f"{key}.bin"), "wb") as f:
+                column.tofile(f)
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "created": time.time(),
+            "source": source,
+            "count": len(ids),
+            "keys": list(RANKING_KEYS),
+        }
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump(meta, f)
+        os.rename(tmp_dir, os.path.join(directory, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _write_atomic(os.path.join(directory, LATEST_FILE), version)
+    prune_snapshots(directory, keep)
+    return version
+
+
+def prune_snapshots(directory: str, keep: int = 3) -> None:
+    """Remove all but the newest keep snapshots, never the LATEST one"""
+    latest = latest_version(directory)
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.isdir(os.path.join(directory, name))
+    )
+    for name in versions[:-keep] if keep > 0 else versions:
+        if name != latest:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+class CatalogSnapshot:
+    """Read-only view of one catalog snapshot.
+
+    Ids, offsets and ranking columns are loaded into compact arrays and an
+    id -> position dict, so a lookup by id is one dict probe plus decoding one
+    line of the memory-mapped documents file.
+    """
+
+    def __init__(self, directory: str, meta: Dict[str, Any], depth: int = 1000):
+        path = os.path.join(directory, meta["version"])
+        self.version: str = meta["version"]
+        self.created: float = meta["created"]
+        self.source: str = meta["source"]
+
+        with open(os.path.join(path, IDS_FILE)) as f:
+            self.ids: Tuple[str, ...] = tuple(f.read().splitlines())
+        self.positions: Dict[str, int] = {movie_id: i for i, movie_id in enumerate(self.ids)}
+        self.offsets = self._read_array(os.path.join(path, OFFSETS_FILE), "Q")
+        columns = {key: self._read_array(os.path.join(path, f"{key}.bin"), "d") for key in meta["keys"]}
+        self.rating_index = RatingIndex.from_columns(self.ids, columns, depth=depth)
+
+        with open(os.path.join(path, DOCUMENTS_FILE), "rb") as f:
+            # mmap cannot map an empty file
+            self._documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+        if len(self.offsets) != len(self.ids) + 1:
+            raise ValueError(f"Catalog snapshot {self.version} has {len(self.ids)} ids but {len(self.offsets) - 1} documents")
+
+    @staticmethod
+    def _read_array(path: str, typecode: str) -> array:
+        values = array(typecode)
+        with open(path, "rb") as f:
+            values.frombytes(f.read())
+        return values
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def document(self, position: int) -> Dict[str, Any]:
+        """Stored document of the movie at position"""
+        return json.loads(self._documents[self.offsets[position]:self.offsets[position + 1]])
+
+    def get(self, movie_id: str, fields: str = "full") -> Optional[Dict[str, Any]]:
+        """Movie with the given field set, or None if the snapshot does not have it"""
+        position = self.positions.get(movie_id)
+        if position is None:
+            return None
+        return project(self.document(position), SELECTIONS[fields])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "entries": len(self.ids),
+            "bytes": self.offsets[-1],
+            "age": time.time() - self.created,
+        }
+
+
+def load_catalog(directory: str, version: Optional[str] = None, depth: int = 1000) -> Optional[CatalogSnapshot]:
+    """Open a snapshot, the latest one by default, or None if there is none usable"""
+    meta = read_meta(directory, version)
+    if meta is None:
+        return None
+    try:
+        return CatalogSnapshot(directory, meta, depth=depth)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not load catalog snapshot {meta.get('version')}: {e}")
+        return None
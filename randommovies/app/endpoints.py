@@ -0,0 +1,47 @@
+import json
+from typing import Any, List, Optional
+from movies import FIELD_SETS, MAX_BATCH_IDS, MAX_PAGE_LIMIT
+from ranking import RANKING_KEYS
+
+# Shared by the Flask (app.py) and ASGI (asgi.py) serving modes
+API_ENDPOINTS = {
+    "/random-movie": "GET - Get a random movie",
+    "/random-movies/<int:n>": "GET - Get N random movies",
+    "/top-movies/<int:n>": "GET - Get top N movies by rating (?by=imdb.rating|imdb.votes|tomatoes.viewer.rating)",
+    "/random-movies": "GET - Get random movies with query parameter ?n=5",
+    "/movie/<int:movie_id>": "GET - Get a specific movie by ID",
+    "/movies": "GET - Get movie IDs, paginated with ?limit=&cursor= or streamed as NDJSON with ?format=ndjson",
+    "/movies/batch": f"GET ?ids=<id>,<id> or POST {{\"ids\": [...]}} - Get up to {MAX_BATCH_IDS} movies by ID in one call",
+    "?fields=<ids|summary|ranking|full>": "Field set returned by the movie endpoints (default full)",
+    "?seed=<int>&unique=true": "Reproducible random draws / skip recently returned movies",
+    "/cache-stats": "GET - Get catalog cache statistics",
+    "/metrics": "GET - Get request, upstream and cache metrics in the Prometheus text format"
+}
+
+INVALID_FIELDS_ERROR = f"Parameter 'fields' must be one of: {', '.join(FIELD_SETS)}"
+INVALID_RANKING_ERROR = f"Parameter 'by' must be one of: {', '.join(RANKING_KEYS)}"
+INVALID_LIMIT_ERROR = f"Parameter 'limit' must be between 1 and {MAX_PAGE_LIMIT}"
+NDJSON_MIMETYPE = "application/x-ndjson"
+INVALID_BATCH_ERROR = f"Provide between 1 and {MAX_BATCH_IDS} movie IDs as ?ids=<id>,<id> or a JSON body {{\"ids\": [...]}}"
+
+def is_true(value) -> bool:
+    """Interpret a query string flag such as ?unique=true"""
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def parse_batch_ids(query_ids: Optional[str], body: Any) -> Optional[List[str]]:
+    """Get the ids of a /movies/batch call from ?ids=a,b or a JSON body, or None if malformed"""
+    if query_ids is not None:
+        return [movie_id.strip() for movie_id in query_ids.split(',') if movie_id.strip()]
+    ids = body.get('ids') if isinstance(body, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(movie_id, str) for movie_id in ids):
+        return None
+    return ids
+
+def wants_ndjson(format_param: Optional[str], accept: Optional[str]) -> bool:
+    """Whether the client asked for an NDJSON stream (?format=ndjson or Accept header)"""
+    if format_param is not None:
+        return format_param.lower() == 'ndjson'
+    return NDJSON_MIMETYPE in (accept or '')
+
+def ndjson_line(movie_id: str) -> str:
+    return json.dumps({"_id": movie_id}) + "\n"
@@ -0,0 +1,246 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterator, Optional, Tuple
+from catalog_snapshot import (
+    CatalogSnapshot, exclusive_lock, latest_version, load_catalog, load_seed_movies, read_meta, save_catalog,
+)
+from movies import IncompleteCatalogError, MovieManager, DEFAULT_PAGE_LIMIT, TOP_INDEX_DEPTH
+from ranking import RatingIndex
+
+# Where movies are read from: "graphql" (the Movies service) or "snapshot" (a local catalog snapshot)
+MOVIES_BACKEND = os.environ.get('MOVIES_BACKEND') or "graphql"
+
+# Local catalog snapshots: directory, seconds between exports and versions kept on disk
+CATALOG_SNAPSHOT_DIR = os.environ.get('CATALOG_SNAPSHOT_DIR') or "catalog-snapshots"
+CATALOG_SNAPSHOT_REFRESH = float(os.environ.get('CATALOG_SNAPSHOT_REFRESH') or 3600)
+CATALOG_SNAPSHOT_KEEP = int(os.environ.get('CATALOG_SNAPSHOT_KEEP') or 3)
+# Seconds before retrying a failed export; doubles with every failure in a row, up to the refresh interval
+CATALOG_SNAPSHOT_RETRY = float(os.environ.get('CATALOG_SNAPSHOT_RETRY') or 30)
+
+# Longest wait between retries when periodic refreshes are off
+MAX_RETRY_DELAY = 3600
+
+# Catalog the first snapshot is built from when there is none on disk
+CATALOG_SEED_FILE = os.environ.get('CATALOG_SEED_FILE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "movies.json")
+
+class LocalMovieManager(MovieManager):
+    """MovieManager serving every read from a local catalog snapshot.
+
+    The manager starts from the latest snapshot on disk, or from one built
+    from the seed file, without calling the Movies service. A background
+    thread exports the catalog from the service right away when that snapshot
+    is missing, from the seed file or stale, then every refresh_interval
+    seconds, and swaps the new snapshot in. While a snapshot is loaded,
+    requests never call the Movies service, so they keep being answered when
+    it is down; without any snapshot they fall back to it.
+    """
+
+    def __init__(self, directory: str = CATALOG_SNAPSHOT_DIR,
+                 refresh_interval: float = CATALOG_SNAPSHOT_REFRESH,
+                 seed_file: Optional[str] = CATALOG_SEED_FILE,
+                 keep: int = CATALOG_SNAPSHOT_KEEP,
+                 retry_interval: float = CATALOG_SNAPSHOT_RETRY,
+                 **kwargs: Any):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.seed_file = seed_file
+        self.keep = keep
+        self.retry_interval = retry_interval
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._counters = {"exports": 0, "export_errors": 0, "loads": 0}
+
+        # A snapshot left by a previous run is served right away, even if stale
+        self.reload()
+        if self.snapshot is None and self.seed_snapshot():
+            self.reload()
+        threading.Thread(target=self._refresh_forever, name="catalog-snapshot", daemon=True).start()
+
+    def seed_snapshot(self) -> Optional[str]:
+        """Build a snapshot from the seed file when there is none yet; returns its version, or None"""
+        if not self.seed_file or not os.path.exists(self.seed_file):
+            return None
+        with exclusive_lock(self.directory):
+            # Another worker may have written one meanwhile
+            if read_meta(self.directory) is not None:
+                return None
+            print(f"Building the catalog snapshot from {self.seed_file}")
+            return save_catalog(self.directory, load_seed_movies(self.seed_file), "seed", keep=self.keep)
+
+    def export_snapshot(self, max_age: Optional[float] = None) -> Optional[str]:
+        """Export the whole catalog from the Movies service into a new snapshot.
+
+        Skipped when the latest snapshot on disk is younger than max_age, e.g.
+        because another worker has just exported it. Returns the new version,
+        or None when skipped; raises when the catalog cannot be fetched whole.
+        """
+        with exclusive_lock(self.directory):
+            meta = read_meta(self.directory)
+            # A snapshot of the seed file is replaced as soon as the service answers
+            if meta and meta["source"] != "seed" and max_age is not None and time.time() - meta["created"] < max_age:
+                return None
+
+            try:
+                movies = self._load_all_movies("full")
+                if not movies:
+                    raise IncompleteCatalogError("The Movies service returned no movies")
+            except Exception:
+                self._counters["export_errors"] += 1
+                raise
+            self._counters["exports"] += 1
+            return save_catalog(self.directory, movies, "graphql", keep=self.keep)
+
+    def reload(self) -> bool:
+        """Switch to the latest snapshot on disk if it is newer than the loaded one"""
+        version = latest_version(self.directory)
+        if not version or (self.snapshot is not None and self.snapshot.version == version):
+            return False
+        snapshot = load_catalog(self.directory, version, depth=TOP_INDEX_DEPTH)
+        if snapshot is None:
+            return False
+        # Requests keep the snapshot they started with; this is a single reference swap
+        self.snapshot = snapshot
+        self._counters["loads"] += 1
+        print(f"Serving catalog snapshot {version} ({len(snapshot)} movies from {snapshot.source})")
+        return True
+
+    def _next_export_delay(self, failures: int) -> Optional[float]:
+        """Seconds before the next export attempt, or None when no more are due"""
+        if failures:
+            # Counted from the failed attempt, not from the age of the snapshot
+            longest = self.refresh_interval if self.refresh_interval > 0 else MAX_RETRY_DELAY
+            return min(self.retry_interval * 2 ** (failures - 1), max(longest, self.retry_interval))
+        meta = read_meta(self.directory)
+        if meta is None or meta["source"] == "seed":
+            return 0.0
+        if self.refresh_interval <= 0:
+            return None
+        return max(0.0, self.refresh_interval - (time.time() - meta["created"]))
+
+    def _refresh_forever(self) -> None:
+        failures = 0
+        # With refreshes off, only a missing or seed snapshot is exported
+        max_age = self.refresh_interval if self.refresh_interval > 0 else math.inf
+        while True:
+            delay = self._next_export_delay(failures)
+            if delay is None:
+                return
+            time.sleep(delay)
+            try:
+                self.export_snapshot(max_age=max_age)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                print(f"Catalog export failed, keeping the current snapshot: {e}")
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading the catalog snapshot: {e}")
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get cache counters plus the loaded snapshot and its export counters"""
+        stats = super().get_cache_stats()
+        snapshot = self.snapshot
+        stats["snapshot"] = dict(self._counters, **(snapshot.stats() if snapshot is not None else {}))
+        return stats
+
+    def _fetch_all_movies(self, fields: str = "full") -> List[Dict[str, Any]]:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return super()._fetch_all_movies(fields)
+        return [snapshot.get(movie_id, fields) for movie_id in snapshot.ids]
+
+    def _get_id_index(self) -> Tuple[str, ...]:
+        snapshot = self.snapshot
+        return snapshot.ids if snapshot is not None else super()._get_id_index()
+
+    def _get_rating_index(self) -> RatingIndex:
+        snapshot = self.snapshot
+        return snapshot.rating_index if snapshot is not None else super()._get_rating_index()
+
+    def get_movie_count(self) -> int:
+        snapshot = self.snapshot
+        return len(snapshot) if snapshot is not None else super().get_movie_count()
+
+    def get_movie_by_id(self, movie_id: str, fields: str = "full") -> Optional[Dict[str, Any]]:
+        """Get a movie by _id; snapshots built from the seed file have ids that are not ObjectIds"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return super().get_movie_by_id(movie_id, fields)
+        return snapshot.get(movie_id, fields)
+
+    def get_movies_by_ids(self, movie_ids: List[str], fields: str = "full") -> Tuple[List[Dict[str, Any]], List[str]]:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return super().get_movies_by_ids(movie_ids, fields)
+
+        movies = []
+        not_found = []
+        for movie_id in dict.fromkeys(movie_ids):
+            movie = snapshot.get(movie_id, fields)
+            if movie is None:
+                not_found.append(movie_id)
+            else:
+                movies.append(movie)
+        return movies, not_found
+
+    def iter_movie_ids(self) -> Iterator[str]:
+        snapshot = self.snapshot
+        return iter(snapshot.ids) if snapshot is not None else super().iter_movie_ids()
+
+class AsyncLocalMovieManager:
+    """asyncio front of LocalMovieManager for the ASGI serving mode (asgi.py).
+
+    Reads from a loaded snapshot never wait on I/O and are answered inline;
+    without a snapshot they go to the Movies service in a worker thread.
+    """
+
+    def __init__(self, manager: Optional[LocalMovieManager] = None):
+        self.manager = manager or LocalMovieManager()
+
+    async def _call(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if self.manager.snapshot is not None:
+            return method(*args, **kwargs)
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def close(self) -> None:
+        """Release the upstream connection pool"""
+        self.manager.transport.close()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self.manager.get_cache_stats()
+
+    async def get_random_movies(self, n: int = 5, fields: str = "full", seed: Optional[int] = None,
+                                avoid_repeats: bool = False) -> List[Dict[str, Any]]:
+        return await self._call(self.manager.get_random_movies, n, fields, seed=seed, avoid_repeats=avoid_repeats)
+
+    async def get_random_movie(self, fields: str = "full", seed: Optional[int] = None,
+                               avoid_repeats: bool = False) -> Dict[str, Any]:
+        return await self._call(self.manager.get_random_movie, fields, seed=seed, avoid_repeats=avoid_repeats)
+
+    async def get_top_movies(self, n: int = 5, fields: str = "full", by: str = "imdb.rating") -> List[Dict[str, Any]]:
+        return await self._call(self.manager.get_top_movies, n, fields, by=by)
+
+    async def get_movie_count(self) -> int:
+        return await self._call(self.manager.get_movie_count)
+
+    async def get_movie_by_id(self, movie_id: str, fields: str = "full") -> Optional[Dict[str, Any]]:
+        return await self._call(self.manager.get_movie_by_id, movie_id, fields)
+
+    async def get_movies_by_ids(self, movie_ids: List[str], fields: str = "full") -> Tuple[List[Dict[str, Any]], List[str]]:
+        return await self._call(self.manager.get_movies_by_ids, movie_ids, fields)
+
+    async def get_all_movie_ids(self) -> List[str]:
+        return await self._call(self.manager.get_all_movie_ids)
+
+    async def get_movie_ids_page(self, cursor: Optional[str] = None,
+                                 limit: int = DEFAULT_PAGE_LIMIT) -> Tuple[List[str], Optional[str], int]:
+        return await self._call(self.manager.get_movie_ids_page, cursor, limit)
+
+    async def iter_movie_ids(self) -> AsyncIterator[str]:
+        for movie_id in await self.get_all_movie_ids():
+            yield movie_id
@@ -0,0 +1,126 @@
+"""Metrics of the service, kept and exposed in the Prometheus format by prometheus_client.
+
+StatsCollector, MetricsMiddleware and peak_resident_bytes have twins in
+recomendador/metrics.py. Each service is built from its own Docker context
+(randommovies/app and recomendador), so they cannot import a shared module;
+fixes to one copy belong in the other.
+"""
+
+import os
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+from prometheus_client import REGISTRY, Gauge, Histogram, disable_created_metrics
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+# With metrics off, the request and upstream hooks are not installed
+METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608, 33554432)
+# Keys of stats() dicts that are levels rather than running counts
+GAUGE_STATS = {"entries", "bytes", "max_entries", "max_bytes", "ttl", "in_flight", "hit_rate", "age"}
+
+# Only <name>_total for counters, without the <name>_created timestamps
+disable_created_metrics()
+
+
+class StatsCollector(Collector):
+    """Metric families read at scrape time from {label value: stats() dict}.
+
+    Running counts become counters named <prefix>_<key>_total, the keys in
+    GAUGE_STATS become gauges named <prefix>_<key>. Nothing is reported
+    until the serving app sets stats.
+    """
+
+    def __init__(self, prefix: str, label: str,
+                 stats: Optional[Callable[[], Dict[str, Dict[str, Any]]]] = None):
+        self.prefix = prefix
+        self.label = label
+        self.stats = stats
+
+    def collect(self) -> Iterator[Metric]:
+        if self.stats is None:
+            return
+        try:
+            groups = self.stats()
+        except Exception as e:
+            print(f"Error collecting metrics: {e}")
+            return
+        families: Dict[str, Metric] = {}
+        for group, stats in groups.items():
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                family = families.get(key)
+                if family is None:
+                    kind = GaugeMetricFamily if key in GAUGE_STATS else CounterMetricFamily
+                    family = families[key] = kind(f"{self.prefix}_{key}", f"{key} of {self.prefix}", labels=[self.label])
+                family.add_metric([group], value)
+        yield from families.values()
+
+
+def peak_resident_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route and counting response bytes.
+
+    The time runs until the last body chunk is sent, so streamed responses
+    are measured whole.
+    """
+
+    def __init__(self, app: Any, duration: Histogram, size: Histogram):
+        self.app = app
+        self.duration = duration
+        self.size = size
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status, sent = 500, 0
+
+        async def send_and_measure(message: Dict[str, Any]) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            # The router stores the matched route in the scope; its path is the template
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.duration.labels(scope["method"], route, status).observe(time.perf_counter() - started)
+            self.size.labels(scope["method"], route).observe(sent)
+
+
+REQUEST_SECONDS = Histogram(
+    "randommovies_http_request_duration_seconds", "Time to serve HTTP requests",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+RESPONSE_BYTES = Histogram(
+    "randommovies_http_response_bytes", "Size of HTTP response bodies",
+    ["method", "route"], buckets=SIZE_BUCKETS)
+UPSTREAM_SECONDS = Histogram(
+    "randommovies_upstream_request_duration_seconds", "Time of calls to the Movies GraphQL service, by root field",
+    ["operation", "outcome"], buckets=LATENCY_BUCKETS)
+UPSTREAM_BYTES = Histogram(
+    "randommovies_upstream_response_bytes", "Size of Movies GraphQL service responses, by root field",
+    ["operation"], buckets=SIZE_BUCKETS)
+# prometheus_client's process collector reports the current resident memory
+PEAK_RESIDENT_BYTES = Gauge("process_peak_resident_memory_bytes", "Peak resident memory size in bytes")
+PEAK_RESIDENT_BYTES.set_function(peak_resident_bytes)
+
+# The serving app points it at its movie manager's get_cache_stats
+CACHE_STATS = StatsCollector("randommovies_cache", "cache")
+REGISTRY.register(CACHE_STATS)
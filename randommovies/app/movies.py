@@ -1,8 +1,15 @@
+import base64
+import bisect
 import json
-import random
-from typing import List, Dict, Any, Optional
+import re
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from cache import CatalogCache, LRUCache
+from singleflight import SingleFlight
+from sampling import MovieSampler
+from ranking import RatingIndex
+from transport import GraphQLError, GraphQLTransport
 
 apiUrl = os.environ.get('MOVIES_URL') or "http://127.0.0.1:4000/graphql"
 ALL_FIELDS = """
@@ -46,165 +53,458 @@ ALL_FIELDS = """
     }
     num_mflix_comments
 """
+ID_FIELDS = """
+    _id
+"""
+SUMMARY_FIELDS = """
+    _id
+    title
+    poster
+    year
+    runtime
+    genres
+    plot
+    imdb {
+        rating
+    }
+"""
+RANKING_FIELDS = """
+    _id
+    imdb {
+        rating
+        votes
+    }
+    tomatoes {
+        viewer {
+            rating
+        }
+    }
+"""
+
+# Named projections; each MovieManager method requests only the set it needs
+FIELD_SETS = {
+    "ids": ID_FIELDS,
+    "summary": SUMMARY_FIELDS,
+    "ranking": RANKING_FIELDS,
+    "full": ALL_FIELDS,
+}
+
+COUNT_QUERY = """
+query {
+    filmCount
+}
+"""
+ID_PAGE_QUERY = """
+query($limit: Int!, $skip: Int!) {
+    films(limit: $limit, skip: $skip) {
+        _id
+    }
+}
+"""
+
+def films_page_query(fields: str) -> str:
+    """Query for one skip/limit page of movies with the given field set"""
+    return f"""
+    query($limit: Int!, $skip: Int!) {{
+        films(limit: $limit, skip: $skip) {{
+            {FIELD_SETS[fields]}
+        }}
+    }}
+    """
+
+def films_by_ids_query(fields: str) -> str:
+    """Query for several movies by _id with the given field set"""
+    return f"""
+    query($ids: [ID!]!) {{
+        filmsByIds(ids: $ids) {{
+            {FIELD_SETS[fields]}
+        }}
+    }}
+    """
+
+def aliased_films_query(count: int, fields: str) -> str:
+    """Query with one aliased films lookup per id ($id0, $id1, ...), for upstreams without filmsByIds"""
+    params = ", ".join(f"$id{i}: ID!" for i in range(count))
+    lookups = "\n".join(
+        f"m{i}: films(limit: 1, filter: {{_id: $id{i}}}) {{ {FIELD_SETS[fields]} }}"
+        for i in range(count)
+    )
+    return f"query({params}) {{ {lookups} }}"
+
+def aliased_films_variables(movie_ids: List[str]) -> Dict[str, str]:
+    """Variables of aliased_films_query for movie_ids"""
+    return {f"id{i}": movie_id for i, movie_id in enumerate(movie_ids)}
+
+def aliased_films(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Movies of an aliased_films_query response, merged into one list"""
+    return [film for films in data.values() for film in (films or [])]
+
+def film_by_id_query(fields: str) -> str:
+    """Query for a single movie by _id with the given field set"""
+    return f"""
+    query($id: ID!) {{
+        films(limit: 1, filter: {{_id: $id}}) {{
+            {FIELD_SETS[fields]}
+        }}
+    }}
+    """
+
+class IncompleteCatalogError(Exception):
+    """A catalog load returned fewer movies than the catalog count"""
+
+def check_complete(movies: List[Dict[str, Any]], total_count: int) -> None:
+    """Raise IncompleteCatalogError unless movies holds the whole catalog"""
+    if len(movies) < total_count:
+        raise IncompleteCatalogError(f"Loaded {len(movies)} of {total_count} movies")
+
+def join_pages(pages: Iterable[List[Dict[str, Any]]], total_count: int) -> List[Dict[str, Any]]:
+    """Movies of every catalog page, in page order; raises IncompleteCatalogError if some are missing"""
+    all_movies = [movie for movies in pages for movie in movies]
+    check_complete(all_movies, total_count)
+    return all_movies
+
+def ids_of(movies: List[Dict[str, Any]]) -> Iterator[str]:
+    """Ids of movies, skipping movies without one"""
+    return (movie['_id'] for movie in movies if movie.get('_id') is not None)
+
+def id_index(movies: List[Dict[str, Any]]) -> Tuple[str, ...]:
+    """Sorted compact index of the ids of a catalog load"""
+    return tuple(sorted(ids_of(movies)))
+
+OBJECT_ID_PATTERN = re.compile(r'^[0-9a-fA-F]{24}$')
+
+def is_object_id(movie_id: Any) -> bool:
+    """Whether movie_id looks like a MongoDB ObjectId; anything else cannot exist upstream"""
+    return isinstance(movie_id, str) and OBJECT_ID_PATTERN.match(movie_id) is not None
+
+def encode_cursor(last_id: str) -> str:
+    """Opaque pagination cursor for the movie id listing, holding the last id returned"""
+    return base64.urlsafe_b64encode(json.dumps({"after": last_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    """Last id encoded in a cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["after"]
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(last_id, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return last_id
+
+def page_of_ids(index: Tuple[str, ...], after: Optional[str], limit: int) -> Tuple[List[str], Optional[str], int]:
+    """One page of a sorted id index, starting after the id of the previous page's cursor.
+
+    Cursors are keysets rather than offsets, so a page never repeats or skips
+    ids when the index is refreshed with movies added or removed in between.
+    """
+    start = bisect.bisect_right(index, after) if after is not None else 0
+    page = list(index[start:start + limit])
+    next_cursor = encode_cursor(page[-1]) if page and start + len(page) < len(index) else None
+    return page, next_cursor, len(index)
+
+def page_at_cursor(index: Tuple[str, ...], cursor: Optional[str], limit: int) -> Tuple[List[str], Optional[str], int]:
+    """page_of_ids for a cursor from a previous page, or the first page without one"""
+    return page_of_ids(index, decode_cursor(cursor) if cursor else None, limit)
+
+def in_request_order(movie_ids: List[str], movies: Dict[str, Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """The movies found for movie_ids, in their order, and the ids not found"""
+    found_movies = [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+    not_found = [movie_id for movie_id in movie_ids if movie_id not in movies]
+    return found_movies, not_found
+
+# Catalog cache settings (seconds / bytes)
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL') or 300)
+CATALOG_CACHE_MAX_STALE = float(os.environ.get('CATALOG_CACHE_MAX_STALE') or 3600)
+CATALOG_CACHE_MAX_BYTES = int(os.environ.get('CATALOG_CACHE_MAX_BYTES') or 256 * 1024 * 1024)
+
+# Per-movie LRU in front of the by-id lookups
+MOVIE_CACHE_SIZE = int(os.environ.get('MOVIE_CACHE_SIZE') or 2048)
+MOVIE_NEGATIVE_TTL = float(os.environ.get('MOVIE_NEGATIVE_TTL') or 30)
+MAX_BATCH_IDS = int(os.environ.get('MAX_BATCH_IDS') or 100)
+
+# Page sizes of the movie id listing (/movies and /)
+DEFAULT_PAGE_LIMIT = int(os.environ.get('DEFAULT_PAGE_LIMIT') or 100)
+MAX_PAGE_LIMIT = int(os.environ.get('MAX_PAGE_LIMIT') or 1000)
+
+# Catalog pagination settings
+PAGE_SIZE = int(os.environ.get('MOVIES_PAGE_SIZE') or 100)
+FETCH_CONCURRENCY = int(os.environ.get('MOVIES_FETCH_CONCURRENCY') or 4)
+
+# Number of recently returned ids skipped by random draws with avoid_repeats
+RANDOM_HISTORY_SIZE = int(os.environ.get('RANDOM_HISTORY_SIZE') or 100)
+
+# Number of presorted entries kept per ranking key
+TOP_INDEX_DEPTH = int(os.environ.get('TOP_INDEX_DEPTH') or 1000)
 
 class MovieManager:
-    def _fetch_movies_from_api(self, limit: int = 100, skip: int = 0) -> List[Dict[str, Any]]:
+    # AsyncMovieManager swaps in the asyncio counterparts
+    transport_class = GraphQLTransport
+    catalog_cache_class = CatalogCache
+    flights_class = SingleFlight
+
+    def __init__(self, cache_ttl: Optional[float] = None,
+                 cache_max_stale: Optional[float] = None,
+                 cache_max_bytes: Optional[int] = None,
+                 transport: Optional[GraphQLTransport] = None,
+                 page_size: int = PAGE_SIZE,
+                 fetch_concurrency: int = FETCH_CONCURRENCY):
+        self.transport = transport or self.transport_class(apiUrl)
+        self.page_size = page_size
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        self.sampler = MovieSampler(history_size=RANDOM_HISTORY_SIZE)
+        self.catalog_cache = self.catalog_cache_class(
+            ttl=CATALOG_CACHE_TTL if cache_ttl is None else cache_ttl,
+            max_stale=CATALOG_CACHE_MAX_STALE if cache_max_stale is None else cache_max_stale,
+            max_bytes=CATALOG_CACHE_MAX_BYTES if cache_max_bytes is None else cache_max_bytes,
+        )
+        self.movie_cache = LRUCache(
+            max_entries=MOVIE_CACHE_SIZE,
+            ttl=self.catalog_cache.ttl,
+            negative_ttl=MOVIE_NEGATIVE_TTL,
+        )
+        # Concurrent requests for the same page, catalog or movie share one upstream call
+        self.flights = self.flights_class()
+
+    def _fetch_movies_from_api(self, limit: int = 100, skip: int = 0, fields: str = "full") -> List[Dict[str, Any]]:
         """Fetch movies from GraphQL API with pagination"""
+        return self.flights.do(("page", fields, limit, skip),
+                               lambda: self._request_movies_page(limit, skip, fields))
+    
+    def _request_movies_page(self, limit: int, skip: int, fields: str) -> List[Dict[str, Any]]:
+        """Fetch one page of movies from GraphQL API; raises on transport errors"""
         if not apiUrl:
             print("Warning: MOVIES_URL environment variable not set.")
             return []
         
-        query = f"""
-        query($limit: Int!, $skip: Int!) {{
-            films(limit: $limit, skip: $skip) {{
-                {ALL_FIELDS}
-            }}
-        }}
-        """
-        
-        try:
-            response = requests.post(apiUrl, json={
-                "query": query,
-                "variables": {"limit": limit, "skip": skip}
-            })
-            response.raise_for_status()
-            data = response.json()
-            
-            if "errors" in data:
-                print(f"GraphQL Error: {data['errors']}")
-                return []
-            
-            return data.get("data", {}).get("films", [])
-        except requests.RequestException as e:
-            print(f"Error fetching movies from API: {e}")
-            return []
-        except Exception as e:
-            print(f"Unexpected error loading movies: {e}")
-            return []
+        data = self.transport.execute(films_page_query(fields), {"limit": limit, "skip": skip})
+        return data.get("films") or []
     
     def _get_total_movie_count(self) -> int:
         """Get total count of movies in database"""
+        return self.flights.do(("count",), self._request_movie_count)
+    
+    def _request_movie_count(self) -> int:
+        """Ask the GraphQL API for the number of movies"""
         if not apiUrl:
             return 0
         
-        query = f"""
-        query {{
-            films(limit: 100){{
-                {ALL_FIELDS}
-            }}
-        }}
-        """
-        
         try:
-            response = requests.post(apiUrl, json={"query": query})
-            response.raise_for_status()
-            data = response.json()
-            
-            if "errors" in data:
-                print(f"GraphQL Error: {data['errors']}")
-                return 0
-            
-            films = data.get("data", {}).get("films", [])
-            
-            return len(films)
+            data = self.transport.execute(COUNT_QUERY)
+            return int(data.get("filmCount") or 0)
+        except GraphQLError as e:
+            # Older Movies services have no filmCount query
+            print(f"filmCount not available, counting movie IDs instead: {e}")
+            return self._count_movies_by_ids()
         except Exception as e:
             print(f"Error fetching movie count: {e}")
             return 0
     
-    def _fetch_all_movies(self) -> List[Dict[str, Any]]:
-        """Fetch all movies from database with pagination"""
-        all_movies = []
+    def _count_movies_by_ids(self, batch_size: int = 1000) -> int:
+        """Count movies by paging through their IDs only"""
+        total = 0
+        try:
+            while True:
+                data = self.transport.execute(ID_PAGE_QUERY, {"limit": batch_size, "skip": total})
+                films = data.get("films") or []
+                total += len(films)
+                if len(films) < batch_size:
+                    return total
+        except Exception as e:
+            print(f"Error counting movies: {e}")
+            return total
+    
+    def _fetch_all_movies(self, fields: str = "full") -> List[Dict[str, Any]]:
+        """Fetch all movies from database, loading pages concurrently"""
+        return self.flights.do(("catalog", fields), lambda: self._load_all_movies(fields))
+    
+    def _load_all_movies(self, fields: str) -> List[Dict[str, Any]]:
+        """Walk every catalog page with a bounded number of concurrent requests.
+        
+        Raises when a page fails or the catalog comes back shorter than its
+        count, so a partial catalog is never cached.
+        """
         total_count = self._get_total_movie_count()
         
         if total_count == 0:
             return []
         
-        batch_size = 100
-        skip = 0
-        
-        while skip < total_count:
-            movies = self._fetch_movies_from_api(limit=batch_size, skip=skip)
-            if not movies:
-                break
-            all_movies.extend(movies)
-            skip += batch_size
+        batch_size = self.page_size
+        skips = range(0, total_count, batch_size)
+        workers = min(self.fetch_concurrency, len(skips))
         
-        return all_movies
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-page") as executor:
+            # map() yields pages in skip order, whatever order they complete in
+            pages = executor.map(lambda skip: self._fetch_movies_from_api(limit=batch_size, skip=skip, fields=fields), skips)
+            return join_pages(pages, total_count)
+    
+    def _request_movies_by_ids(self, movie_ids: List[str], fields: str) -> List[Dict[str, Any]]:
+        """Fetch several movies by _id in one request; raises on transport errors"""
+        try:
+            data = self.transport.execute(films_by_ids_query(fields), {"ids": list(movie_ids)})
+            return data.get("filmsByIds") or []
+        except GraphQLError as e:
+            # Older Movies services have no filmsByIds query
+            print(f"filmsByIds not available, using aliased lookups instead: {e}")
+            data = self.transport.execute(aliased_films_query(len(movie_ids), fields),
+                                          aliased_films_variables(movie_ids))
+            return aliased_films(data)
+    
+    def _fetch_movies_by_ids(self, movie_ids: List[str], fields: str = "full") -> List[Dict[str, Any]]:
+        """Fetch several movies by _id, keeping the requested order"""
+        try:
+            movies, _ = self.get_movies_by_ids(movie_ids, fields)
+            return movies
+        except Exception as e:
+            print(f"Error fetching movies by IDs: {e}")
+            return []
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get catalog and movie cache hit/miss/refresh counters and coalesced calls"""
+        return {
+            "catalog": self.catalog_cache.stats(),
+            "movies": self.movie_cache.stats(),
+            "singleflight": self.flights.stats(),
+        }
+    
+    def _get_id_index(self) -> Tuple[str, ...]:
+        """Get the sorted compact index of every movie id, served from the catalog cache"""
+        return self.catalog_cache.get("id-index", lambda: id_index(self._fetch_all_movies("ids")))
     
-    def get_random_movies(self, n: int = 5) -> List[Dict[str, Any]]:
+    def get_random_movies(self, n: int = 5, fields: str = "full", seed: Optional[int] = None,
+                          avoid_repeats: bool = False) -> List[Dict[str, Any]]:
         """Get N random movies"""
         if n <= 0:
             return []
         
-        movies = self._fetch_all_movies()
-        n = min(n, len(movies))
-        return random.sample(movies, n) if movies else []
+        movie_ids = self.sampler.sample(self._get_id_index(), n, seed=seed, avoid_repeats=avoid_repeats)
+        return self._fetch_movies_by_ids(movie_ids, fields)
     
-    def get_random_movie(self) -> Dict[str, Any]:
+    def get_random_movie(self, fields: str = "full", seed: Optional[int] = None,
+                         avoid_repeats: bool = False) -> Dict[str, Any]:
         """Get a single random movie"""
-        movies = self._fetch_all_movies()
-        return random.choice(movies) if movies else {}
+        movies = self.get_random_movies(1, fields, seed=seed, avoid_repeats=avoid_repeats)
+        return movies[0] if movies else {}
     
-    def get_top_movies(self, n: int = 5) -> List[Dict[str, Any]]:
-        """Get top N movies based on rating"""
+    def _get_rating_index(self) -> RatingIndex:
+        """Get the presorted ranking index, rebuilt whenever the catalog cache refreshes it"""
+        def load():
+            movies = self._fetch_all_movies("ranking")
+            return RatingIndex(movies, depth=TOP_INDEX_DEPTH) if movies else None
+        
+        return self.catalog_cache.get("rating-index", load, sizeof=lambda index: index.approximate_size())
+    
+    def get_top_movies(self, n: int = 5, fields: str = "full", by: str = "imdb.rating") -> List[Dict[str, Any]]:
+        """Get top N movies based on rating (or another ranking key)"""
         if n <= 0:
             return []
         
-        movies = self._fetch_all_movies()
-        
-        # Filter out movies without a rating
-        movies_with_rating = [
-            movie for movie in movies 
-            if movie.get('imdb', {}).get('rating') is not None
-        ]
-        
-        # Sort by rating in descending order
-        sorted_movies = sorted(
-            movies_with_rating, 
-            key=lambda x: x.get('imdb', {}).get('rating', 0), 
-            reverse=True
-        )
+        index = self._get_rating_index()
+        if not index:
+            return []
         
-        n = min(n, len(sorted_movies))
-        return sorted_movies[:n]
+        top = index.top_n(by, n)
+        return self._fetch_movies_by_ids([movie_id for _, movie_id in top], fields)
     
     def get_movie_count(self) -> int:
         """Get total number of movies in database"""
         return self._get_total_movie_count()
     
-    def get_movie_by_id(self, movie_id: str) -> Optional[Dict[str, Any]]:
+    def get_movie_by_id(self, movie_id: str, fields: str = "full") -> Optional[Dict[str, Any]]:
         """Get a movie by its MongoDB _id"""
-        if not apiUrl:
-            return None
-        
-        query = f"""
-        query($id: ID!) {{
-            films(limit: 1, filter: {{_id: $id}}) {{
-                {ALL_FIELDS}
-            }}
-        }}
-        """
+        found, movie = self._cached_movie(movie_id, fields)
+        if found:
+            return movie
         
         try:
-            response = requests.post(apiUrl, json={
-                "query": query,
-                "variables": {"id": movie_id}
-            })
-            response.raise_for_status()
-            data = response.json()
-            
-            if "errors" in data:
-                print(f"GraphQL Error: {data['errors']}")
-                return None
-            
-            films = data.get("data", {}).get("films", [])
-            return films[0] if films else None
-            # return data.get("data", {}).get("movieById", None)
+            films = self.flights.do(("movie", movie_id, fields),
+                                    lambda: self._request_movie_by_id(movie_id, fields))
+            movie = films[0] if films else None
+        except GraphQLError as e:
+            print(e)
+            return None
         except Exception as e:
             print(f"Error fetching movie by ID: {e}")
             return None
+        
+        self.movie_cache.put((movie_id, fields), movie)
+        return movie
+    
+    def _request_movie_by_id(self, movie_id: str, fields: str) -> List[Dict[str, Any]]:
+        """Fetch the films list matching one _id; raises on transport errors"""
+        data = self.transport.execute(film_by_id_query(fields), {"id": movie_id})
+        return data.get("films") or []
+    
+    def get_movies_by_ids(self, movie_ids: List[str], fields: str = "full") -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Get several movies by _id with at most one upstream query.
+        
+        Returns the movies found, in request order, and the ids that do not
+        exist. Raises on upstream errors.
+        """
+        unique_ids = list(dict.fromkeys(movie_ids))
+        movies, missing = self._cached_movies(unique_ids, fields)
+        
+        if missing and apiUrl:
+            films = self.flights.do(("movies", tuple(missing), fields),
+                                    lambda: self._request_movies_by_ids(missing, fields))
+            self._cache_fetched(missing, films, fields, movies)
+        
+        return in_request_order(unique_ids, movies)
+    
+    def _cached_movie(self, movie_id: str, fields: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(found, movie) from the movie cache; ids that cannot exist upstream are found as None"""
+        if not apiUrl or not is_object_id(movie_id):
+            return True, None
+        return self.movie_cache.get((movie_id, fields))
+    
+    def _cached_movies(self, movie_ids: List[str], fields: str) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Movies of movie_ids found in the movie cache, by id, and the ids to fetch"""
+        movies: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        
+        for movie_id in movie_ids:
+            if not is_object_id(movie_id):
+                continue
+            found, movie = self.movie_cache.get((movie_id, fields))
+            if not found:
+                missing.append(movie_id)
+            elif movie is not None:
+                movies[movie_id] = movie
+        return movies, missing
+    
+    def _cache_fetched(self, missing: List[str], films: List[Dict[str, Any]], fields: str,
+                       movies: Dict[str, Dict[str, Any]]) -> None:
+        """Cache the films fetched for missing, None for ids upstream does not have, and add them to movies"""
+        fetched = {film.get('_id'): film for film in films if film}
+        for movie_id in missing:
+            movie = fetched.get(movie_id)
+            self.movie_cache.put((movie_id, fields), movie)
+            if movie is not None:
+                movies[movie_id] = movie
     
     def get_all_movie_ids(self) -> List[str]:
         """Get list of all available movie IDs"""
-        movies = self._fetch_all_movies()
-        return [movie.get('_id') for movie in movies if movie.get('_id') is not None]
\ No newline at end of file
+        return list(self._get_id_index())
+    
+    def get_movie_ids_page(self, cursor: Optional[str] = None,
+                           limit: int = DEFAULT_PAGE_LIMIT) -> Tuple[List[str], Optional[str], int]:
+        """Get one page of movie IDs.
+        
+        Returns the ids, the cursor of the next page (None on the last page)
+        and the total number of ids. Raises ValueError for malformed cursors.
+        """
+        return page_at_cursor(self._get_id_index(), cursor, limit)
+    
+    def iter_movie_ids(self) -> Iterator[str]:
+        """Yield every movie ID as upstream pages arrive, without holding the whole list.
+        
+        Upstream errors are raised mid-stream, so a failed walk is never
+        mistaken for the end of the catalog.
+        """
+        skip = 0
+        while True:
+            movies = self._fetch_movies_from_api(limit=self.page_size, skip=skip, fields="ids")
+            yield from ids_of(movies)
+            if len(movies) < self.page_size:
+                return
+            skip += self.page_size
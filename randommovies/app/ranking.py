@@ -0,0 +1,89 @@
+import heapq
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Keys movies can be ranked by, as dotted paths into the movie document
+RANKING_KEYS = ("imdb.rating", "imdb.votes", "tomatoes.viewer.rating")
+
+
+def get_path(movie: Dict[str, Any], path: str) -> Optional[float]:
+    """Get a numeric value from a movie by dotted path, or None if missing"""
+    value: Any = movie
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+class RatingIndex:
+    """Presorted top-N ranking of movies for every key in RANKING_KEYS.
+
+    Keeps one compact column of values per key, aligned with a tuple of ids,
+    plus the best ``depth`` (value, id) pairs of each key in descending order,
+    selected with a heap instead of a full sort. Requests for up to ``depth``
+    movies are a slice; larger ones fall back to a heap over the column.
+    """
+
+    def __init__(self, movies: Iterable[Dict[str, Any]], keys: Tuple[str, ...] = RANKING_KEYS,
+                 depth: int = 1000):
+        ids = []
+        columns = {key: array("d") for key in keys}
+        for movie in movies:
+            movie_id = movie.get("_id")
+            if movie_id is None:
+                continue
+            ids.append(movie_id)
+            for key in keys:
+                value = get_path(movie, key)
+                columns[key].append(math.nan if value is None else value)
+        self._build(ids, columns, depth)
+
+    @classmethod
+    def from_columns(cls, ids: Iterable[str], columns: Dict[str, array], depth: int = 1000) -> "RatingIndex":
+        """Index over columns that are already built, one per key aligned with ids (NaN when missing)"""
+        index = cls.__new__(cls)
+        index._build(ids, columns, depth)
+        return index
+
+    def _build(self, ids: Iterable[str], columns: Dict[str, array], depth: int) -> None:
+        self.depth = depth
+        self.ids: Tuple[str, ...] = tuple(ids)
+        self.columns: Dict[str, array] = columns
+        self.top: Dict[str, Tuple[array, Tuple[str, ...]]] = {}
+        for key in columns:
+            pairs = self._select(key, depth)
+            self.top[key] = (array("d", (value for value, _ in pairs)),
+                             tuple(movie_id for _, movie_id in pairs))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def top_n(self, key: str, n: int) -> List[Tuple[float, str]]:
+        """Get the n best (value, id) pairs for key, in descending order"""
+        if n <= 0 or key not in self.columns:
+            return []
+        if n <= self.depth:
+            values, ids = self.top[key]
+            return list(zip(values[:n], ids[:n]))
+        return self._select(key, n)
+
+    def approximate_size(self) -> int:
+        """Rough size in bytes of the index"""
+        id_bytes = sum(len(movie_id) for movie_id in self.ids)
+        value_bytes = sum(column.itemsize * len(column) for column in self.columns.values())
+        top_bytes = sum(values.itemsize * len(values) * 2 for values, _ in self.top.values())
+        return id_bytes + value_bytes + top_bytes
+
+    def _select(self, key: str, n: int) -> List[Tuple[float, str]]:
+        column = self.columns[key]
+        # NaN marks a missing value; nlargest keeps input order among ties
+        positions = heapq.nlargest(
+            n,
+            (i for i in range(len(column)) if column[i] == column[i]),
+            key=column.__getitem__
+        )
+        return [(column[i], self.ids[i]) for i in positions]
@@ -0,0 +1,60 @@
+import random
+import threading
+from collections import deque
+from typing import List, Optional, Sequence
+
+
+class MovieSampler:
+    """Draws random movie ids from a compact id index.
+
+    Picks random positions in the index instead of shuffling or copying it,
+    so drawing k ids costs O(k) whatever the catalog size. When asked to avoid
+    repeats, ids returned by the last ``history_size`` draws are skipped as long
+    as enough other ids remain.
+    """
+
+    def __init__(self, history_size: int = 100):
+        self.history_size = history_size
+        self._history: deque = deque(maxlen=history_size)
+        self._recent: set = set()
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+
+    def sample(self, ids: Sequence[str], k: int, seed: Optional[int] = None,
+               avoid_repeats: bool = False) -> List[str]:
+        """Draw up to k distinct ids from ids"""
+        total = len(ids)
+        k = min(k, total)
+        if k <= 0:
+            return []
+
+        rng = random.Random(seed) if seed is not None else self._rng
+        with self._lock:
+            skip = self._recent if avoid_repeats and total - len(self._recent) >= k else ()
+            picked: List[str] = []
+            seen = set()
+            while len(picked) < k:
+                position = rng.randrange(total)
+                if position in seen:
+                    continue
+                seen.add(position)
+                movie_id = ids[position]
+                if movie_id in skip:
+                    continue
+                picked.append(movie_id)
+
+            if avoid_repeats:
+                self._remember(picked)
+        return picked
+
+    def _remember(self, movie_ids: List[str]) -> None:
+        # Called with the lock held
+        if not self.history_size:
+            return
+        for movie_id in movie_ids:
+            if movie_id in self._recent:
+                continue
+            if len(self._history) == self._history.maxlen:
+                self._recent.discard(self._history[0])
+            self._history.append(movie_id)
+            self._recent.add(movie_id)
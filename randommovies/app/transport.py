@@ -0,0 +1,158 @@
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import METRICS_ENABLED, UPSTREAM_BYTES, UPSTREAM_SECONDS
+
+# Connection pool and timeout settings for calls to the Movies GraphQL service
+MOVIES_POOL_SIZE = int(os.environ.get('MOVIES_POOL_SIZE') or 10)
+MOVIES_CONNECT_TIMEOUT = float(os.environ.get('MOVIES_CONNECT_TIMEOUT') or 3.05)
+MOVIES_READ_TIMEOUT = float(os.environ.get('MOVIES_READ_TIMEOUT') or 30)
+MOVIES_COMPRESSION = (os.environ.get('MOVIES_COMPRESSION') or 'true').lower() in ('1', 'true', 'yes')
+
+Timeout = Union[float, Tuple[float, float]]
+
+# First field selected by a query, past an optional alias
+ROOT_FIELD = re.compile(r'\{\s*(?:\w+\s*:\s*)?(\w+)')
+
+
+class GraphQLError(Exception):
+    """Raised when the GraphQL response contains errors"""
+
+    def __init__(self, errors: Any):
+        super().__init__(f"GraphQL Error: {errors}")
+        self.errors = errors
+
+
+def _compression_header(compression: bool) -> str:
+    return "gzip, deflate" if compression else "identity"
+
+
+def _parse_response(data: Dict[str, Any]) -> Dict[str, Any]:
+    if data.get("errors"):
+        raise GraphQLError(data["errors"])
+    return data.get("data") or {}
+
+
+@lru_cache(maxsize=256)
+def operation_name(query: str) -> str:
+    """Root field of a query (films, filmCount, filmsByIds), used to label its metrics"""
+    match = ROOT_FIELD.search(query)
+    return match.group(1) if match else "unknown"
+
+
+def _observe_call(query: str, started: float, outcome: str, size: Optional[int]) -> None:
+    if not METRICS_ENABLED:
+        return
+    operation = operation_name(query)
+    UPSTREAM_SECONDS.labels(operation, outcome).observe(time.perf_counter() - started)
+    if size is not None:
+        UPSTREAM_BYTES.labels(operation).observe(size)
+
+
+class GraphQLTransport:
+    """Shared keep-alive HTTP transport for GraphQL calls.
+
+    A single ``requests.Session`` is reused for every call, so sockets to the
+    Movies service are pooled and kept alive between requests instead of being
+    opened per page or per lookup. Every call is bounded by a timeout.
+    """
+
+    def __init__(self, url: str, pool_size: int = MOVIES_POOL_SIZE,
+                 connect_timeout: float = MOVIES_CONNECT_TIMEOUT,
+                 read_timeout: float = MOVIES_READ_TIMEOUT,
+                 compression: bool = MOVIES_COMPRESSION):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Connection": "keep-alive",
+            "Accept": "application/json",
+            "Accept-Encoding": _compression_header(compression),
+        })
+
+    def execute(self, query: str, variables: Optional[Dict[str, Any]] = None,
+                timeout: Optional[Timeout] = None) -> Dict[str, Any]:
+        """Run a GraphQL query and return its ``data`` object.
+
+        Raises ``requests.RequestException`` on transport errors and timeouts,
+        and ``GraphQLError`` when the response reports errors.
+        """
+        payload: Dict[str, Any] = {"query": query}
+        if variables is not None:
+            payload["variables"] = variables
+
+        started = time.perf_counter()
+        outcome, size = "error", None
+        try:
+            response = self.session.post(self.url, json=payload, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            size = len(response.content)
+            data = _parse_response(response.json())
+            outcome = "ok"
+            return data
+        finally:
+            _observe_call(query, started, outcome, size)
+
+    def close(self) -> None:
+        """Close every pooled connection"""
+        self.session.close()
+
+
+class AsyncGraphQLTransport:
+    """Non-blocking counterpart of GraphQLTransport built on ``httpx.AsyncClient``.
+
+    Waiting on the Movies service does not hold a thread, so many requests can
+    share one event loop and one pool of keep-alive connections.
+    """
+
+    def __init__(self, url: str, pool_size: int = MOVIES_POOL_SIZE,
+                 connect_timeout: float = MOVIES_CONNECT_TIMEOUT,
+                 read_timeout: float = MOVIES_READ_TIMEOUT,
+                 compression: bool = MOVIES_COMPRESSION):
+        self.url = url
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            headers={
+                "Accept": "application/json",
+                "Accept-Encoding": _compression_header(compression),
+            },
+        )
+
+    async def execute(self, query: str, variables: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Run a GraphQL query and return its ``data`` object.
+
+        Raises ``httpx.HTTPError`` on transport errors and timeouts, and
+        ``GraphQLError`` when the response reports errors.
+        """
+        payload: Dict[str, Any] = {"query": query}
+        if variables is not None:
+            payload["variables"] = variables
+
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        started = time.perf_counter()
+        outcome, size = "error", None
+        try:
+            response = await self.client.post(self.url, json=payload, **kwargs)
+            response.raise_for_status()
+            size = len(response.content)
+            data = _parse_response(response.json())
+            outcome = "ok"
+            return data
+        finally:
+            _observe_call(query, started, outcome, size)
+
+    async def close(self) -> None:
+        """Close every pooled connection"""
+        await self.client.aclose()
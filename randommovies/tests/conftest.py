@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The app modules import each other by name, as in the Docker image
+sys.path.insert(0, os.path.join(ROOT, "randommovies", "app"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import catalog
+import fake_movies
+from transport import GraphQLTransport
+
+
+@pytest.fixture
+def movies():
+    """Synthetic catalog served by movies_service; tests may add or remove movies"""
+    return catalog.make_movies(300)
+
+
+@pytest.fixture
+def movies_service(movies):
+    """GraphQL stand-in for the Movies service; yields its url"""
+    server, url = fake_movies.start(movies)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport(movies_service):
+    transport = GraphQLTransport(movies_service)
+    yield transport
+    transport.close()
+
+
+class Clock:
+    """Stand-in for the time module, advanced by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def wait_for():
+    """Polls a condition until it holds, failing the test after timeout seconds"""
+    def wait(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "timed out"
+            time.sleep(0.01)
+    return wait
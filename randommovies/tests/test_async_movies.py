@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from async_movies import AsyncMovieManager
+from movies import MovieManager
+from transport import AsyncGraphQLTransport
+
+
+@pytest.fixture
+def manager(transport):
+    return MovieManager(transport=transport, page_size=50)
+
+
+def run(movies_service, calls):
+    """Runs calls(async_manager) on a fresh event loop and returns its result"""
+    async def main():
+        async_manager = AsyncMovieManager(transport=AsyncGraphQLTransport(movies_service), page_size=50)
+        try:
+            return await calls(async_manager)
+        finally:
+            await async_manager.close()
+
+    return asyncio.run(main())
+
+
+def test_async_manager_answers_like_the_sync_one(manager, movies_service, movies):
+    wanted = [movies[3]["_id"], movies[1]["_id"], movies[3]["_id"], "ffffffffffffffffffffffff", "bad"]
+
+    async def calls(async_manager):
+        page, cursor, total = await async_manager.get_movie_ids_page(limit=40)
+        return {
+            "count": await async_manager.get_movie_count(),
+            "first_page": (page, cursor, total),
+            "second_page": await async_manager.get_movie_ids_page(cursor, 40),
+            "streamed": [movie_id async for movie_id in async_manager.iter_movie_ids()],
+            "batch": await async_manager.get_movies_by_ids(wanted, "summary"),
+            "movie": await async_manager.get_movie_by_id(movies[5]["_id"]),
+            "missing": await async_manager.get_movie_by_id("ffffffffffffffffffffffff"),
+            "top": await async_manager.get_top_movies(5, "ranking", by="tomatoes.viewer.rating"),
+            "random": await async_manager.get_random_movies(8, "ids", seed=11),
+        }
+
+    results = run(movies_service, calls)
+    page, cursor, total = manager.get_movie_ids_page(limit=40)
+    assert results == {
+        "count": manager.get_movie_count(),
+        "first_page": (page, cursor, total),
+        "second_page": manager.get_movie_ids_page(cursor, 40),
+        "streamed": list(manager.iter_movie_ids()),
+        "batch": manager.get_movies_by_ids(wanted, "summary"),
+        "movie": manager.get_movie_by_id(movies[5]["_id"]),
+        "missing": None,
+        "top": manager.get_top_movies(5, "ranking", by="tomatoes.viewer.rating"),
+        "random": manager.get_random_movies(8, "ids", seed=11),
+    }
+
+
+def test_async_manager_caches_movies(movies_service, movies):
+    async def calls(async_manager):
+        await async_manager.get_movies_by_ids([movies[2]["_id"], "ffffffffffffffffffffffff"], "ids")
+        await async_manager.get_movies_by_ids([movies[2]["_id"], "ffffffffffffffffffffffff"], "ids")
+        return async_manager.get_cache_stats()
+
+    stats = run(movies_service, calls)
+    assert stats["movies"]["hits"] == 1
+    assert stats["movies"]["negative_hits"] == 1
+    assert stats["singleflight"]["executions"] == 1
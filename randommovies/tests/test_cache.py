@@ -0,0 +1,147 @@
+import asyncio
+import threading
+
+import pytest
+
+import cache
+from cache import AsyncCatalogCache, CatalogCache, LRUCache
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(cache, "time", clock)
+
+
+def test_catalog_cache_serves_fresh_entries(clock):
+    catalog_cache = CatalogCache(ttl=10, max_stale=100)
+    calls = []
+    loader = lambda: calls.append(1) or ["a"]
+
+    assert catalog_cache.get("ids", loader) == ["a"]
+    clock.advance(10)
+    assert catalog_cache.get("ids", loader) == ["a"]
+    assert len(calls) == 1
+    assert catalog_cache.stats()["hits"] == 1
+    assert catalog_cache.stats()["misses"] == 1
+
+
+def test_catalog_cache_serves_stale_entries_while_refreshing(clock, wait_for):
+    catalog_cache = CatalogCache(ttl=10, max_stale=100)
+    catalog_cache.get("ids", lambda: ["old"])
+    clock.advance(11)
+
+    release = threading.Event()
+
+    def slow_loader():
+        release.wait(5)
+        return ["new"]
+
+    assert catalog_cache.get("ids", slow_loader) == ["old"]
+    # A second stale hit does not start another refresh
+    assert catalog_cache.get("ids", slow_loader) == ["old"]
+    release.set()
+    wait_for(lambda: catalog_cache.stats()["refreshes"] == 1)
+    assert catalog_cache.get("ids", slow_loader) == ["new"]
+    assert catalog_cache.stats()["stale_hits"] == 2
+
+
+def test_catalog_cache_keeps_stale_entry_when_refresh_fails(clock, wait_for):
+    catalog_cache = CatalogCache(ttl=10, max_stale=100)
+    catalog_cache.get("ids", lambda: ["old"])
+    clock.advance(11)
+
+    def failing_loader():
+        raise RuntimeError("upstream down")
+
+    assert catalog_cache.get("ids", failing_loader) == ["old"]
+    wait_for(lambda: catalog_cache.stats()["refresh_errors"] == 1)
+    assert catalog_cache.get("ids", lambda: ["new"]) == ["old"]
+
+
+def test_catalog_cache_loads_synchronously_past_max_stale(clock):
+    catalog_cache = CatalogCache(ttl=10, max_stale=100)
+    catalog_cache.get("ids", lambda: ["old"])
+    clock.advance(111)
+    assert catalog_cache.get("ids", lambda: ["new"]) == ["new"]
+    assert catalog_cache.stats()["misses"] == 2
+
+
+def test_catalog_cache_never_caches_empty_results():
+    catalog_cache = CatalogCache()
+    catalog_cache.get("ids", lambda: [])
+    assert catalog_cache.get("ids", lambda: ["a"]) == ["a"]
+    assert catalog_cache.stats()["entries"] == 1
+
+
+def test_catalog_cache_evicts_least_recently_used_past_max_bytes():
+    catalog_cache = CatalogCache(max_bytes=25, sizeof=lambda value: 10)
+    catalog_cache.get("a", lambda: [1])
+    catalog_cache.get("b", lambda: [2])
+    catalog_cache.get("a", lambda: [1])
+    catalog_cache.get("c", lambda: [3])
+
+    stats = catalog_cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 20
+    assert catalog_cache.get("b", lambda: ["reloaded"]) == ["reloaded"]
+
+
+def test_catalog_cache_invalidate():
+    catalog_cache = CatalogCache()
+    catalog_cache.get("a", lambda: [1])
+    catalog_cache.get("b", lambda: [2])
+    catalog_cache.invalidate("a")
+    assert catalog_cache.stats()["entries"] == 1
+    catalog_cache.invalidate()
+    assert catalog_cache.stats()["entries"] == 0
+    assert catalog_cache.stats()["bytes"] == 0
+
+
+def test_async_catalog_cache_refreshes_on_the_loop(clock):
+    async def scenario():
+        catalog_cache = AsyncCatalogCache(ttl=10, max_stale=100)
+
+        async def load_old():
+            return ["old"]
+
+        async def load_new():
+            return ["new"]
+
+        await catalog_cache.get("ids", load_old)
+        clock.advance(11)
+        assert await catalog_cache.get("ids", load_new) == ["old"]
+        await asyncio.gather(*catalog_cache._tasks)
+        assert await catalog_cache.get("ids", load_new) == ["new"]
+
+    asyncio.run(scenario())
+
+
+def test_lru_cache_remembers_missing_keys_for_negative_ttl(clock):
+    lru = LRUCache(ttl=300, negative_ttl=30)
+    lru.put("missing", None)
+    assert lru.get("missing") == (True, None)
+    clock.advance(31)
+    assert lru.get("missing") == (False, None)
+
+    stats = lru.stats()
+    assert stats["negative_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_cache_negative_ttl_zero_disables_negative_entries():
+    lru = LRUCache(negative_ttl=0)
+    lru.put("missing", None)
+    assert lru.get("missing") == (False, None)
+
+
+def test_lru_cache_expires_and_evicts(clock):
+    lru = LRUCache(max_entries=2, ttl=10)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == (True, 1)
+    lru.put("c", 3)
+    assert lru.get("b") == (False, None)
+    assert lru.stats()["evictions"] == 1
+
+    clock.advance(10)
+    assert lru.get("a") == (False, None)
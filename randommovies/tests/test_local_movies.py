@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+import catalog
+from catalog_snapshot import latest_version, load_catalog, read_meta, save_catalog
+from local_movies import LocalMovieManager
+from movies import IncompleteCatalogError, MovieManager
+from ranking import RANKING_KEYS, RatingIndex
+from transport import GraphQLTransport
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "data", "movies.json")
+# Nothing listens there, so every export fails
+DOWN_URL = "http://127.0.0.1:1/graphql"
+
+
+@pytest.fixture
+def down_transport():
+    transport = GraphQLTransport(DOWN_URL)
+    yield transport
+    transport.close()
+
+
+def test_snapshot_round_trip(tmp_path, movies):
+    version = save_catalog(str(tmp_path), reversed(movies), "graphql")
+    snapshot = load_catalog(str(tmp_path))
+
+    assert snapshot.version == version == latest_version(str(tmp_path))
+    assert snapshot.ids == tuple(sorted(movie["_id"] for movie in movies))
+    assert snapshot.document(snapshot.positions[movies[7]["_id"]]) == movies[7]
+    assert snapshot.get(movies[7]["_id"], "ids") == {"_id": movies[7]["_id"]}
+    assert snapshot.get("ffffffffffffffffffffffff") is None
+
+    index = RatingIndex(movies)
+    for key in RANKING_KEYS:
+        # Ties may come in another order, since the snapshot is sorted by id
+        assert [value for value, _ in snapshot.rating_index.top_n(key, 50)] == [value for value, _ in index.top_n(key, 50)]
+
+
+def test_snapshot_projects_field_sets_like_the_movies_service(tmp_path, transport, movies):
+    save_catalog(str(tmp_path), movies, "graphql")
+    snapshot = load_catalog(str(tmp_path))
+    upstream = MovieManager(transport=transport)
+    for fields in ("ids", "summary", "ranking", "full"):
+        expected = {movie["_id"]: movie for movie in upstream._fetch_all_movies(fields)}
+        assert [snapshot.get(movie_id, fields) for movie_id in snapshot.ids] == [expected[movie_id] for movie_id in snapshot.ids]
+
+
+def test_old_snapshots_are_pruned(tmp_path):
+    movies = catalog.make_movies(5)
+    versions = [save_catalog(str(tmp_path), movies, "graphql", keep=2) for _ in range(4)]
+    assert sorted(os.listdir(tmp_path)) == sorted(versions[-2:] + ["LATEST"])
+
+
+def test_manager_starts_from_the_seed_file_and_exports(tmp_path, transport, movies, wait_for):
+    manager = LocalMovieManager(directory=str(tmp_path), refresh_interval=3600, seed_file=SEED_FILE,
+                                transport=transport)
+    # The seed snapshot may already have been replaced by the export
+    assert manager.snapshot is not None
+
+    wait_for(lambda: manager.snapshot.source == "graphql")
+    assert manager.get_movie_count() == len(movies)
+    assert manager.get_movie_by_id(movies[0]["_id"], "ids") == {"_id": movies[0]["_id"]}
+    page, cursor, total = manager.get_movie_ids_page(limit=100)
+    assert page == sorted(movie["_id"] for movie in movies)[:100]
+    assert manager.get_cache_stats()["snapshot"]["exports"] == 1
+
+
+def test_manager_serves_the_seed_snapshot_while_the_service_is_down(tmp_path, down_transport, wait_for):
+    manager = LocalMovieManager(directory=str(tmp_path), refresh_interval=3600, seed_file=SEED_FILE,
+                                retry_interval=3600, transport=down_transport)
+    wait_for(lambda: manager.get_cache_stats()["snapshot"]["export_errors"] == 1)
+
+    assert manager.snapshot.source == "seed"
+    assert manager.get_movie_count() == 5
+    assert manager.get_movie_by_id("1")["title"] == "The Shawshank Redemption"
+    assert manager.get_top_movies(1, "ranking")[0]["imdb"]["rating"] == 9.3
+
+
+def test_manager_keeps_its_snapshot_when_an_export_fails(tmp_path, down_transport, movies):
+    save_catalog(str(tmp_path), movies, "graphql")
+    manager = LocalMovieManager(directory=str(tmp_path), refresh_interval=3600, seed_file=None,
+                                transport=down_transport)
+    version = manager.snapshot.version
+
+    with pytest.raises(Exception):
+        manager.export_snapshot()
+    assert manager.reload() is False
+    assert manager.snapshot.version == version
+    assert manager.get_cache_stats()["snapshot"]["export_errors"] == 1
+
+
+def test_empty_catalog_is_not_exported(tmp_path, transport, movies):
+    save_catalog(str(tmp_path), movies, "graphql")
+    manager = LocalMovieManager(directory=str(tmp_path), refresh_interval=3600, seed_file=None,
+                                transport=transport)
+    movies.clear()
+    with pytest.raises(IncompleteCatalogError):
+        manager.export_snapshot()
+    assert read_meta(str(tmp_path))["count"] == 300
+
+
+def test_recent_snapshots_are_not_exported_again(tmp_path, transport, movies):
+    version = save_catalog(str(tmp_path), movies, "graphql")
+    manager = LocalMovieManager(directory=str(tmp_path), refresh_interval=3600, seed_file=None,
+                                transport=transport)
+    assert manager.export_snapshot(max_age=3600) is None
+    assert latest_version(str(tmp_path)) == version
+
+
+def test_export_delays(tmp_path, down_transport, movies):
+    save_catalog(str(tmp_path), movies, "graphql")
+    manager = LocalMovieManager(directory=str(tmp_path), refresh_interval=100, seed_file=None,
+                                retry_interval=30, transport=down_transport)
+
+    # A fresh snapshot is exported again once it is refresh_interval old
+    assert 99 < manager._next_export_delay(0) <= 100
+    # Failed exports are retried, doubling up to the refresh interval
+    assert [manager._next_export_delay(failures) for failures in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+    manager.refresh_interval = 0
+    assert manager._next_export_delay(0) is None
+    assert manager._next_export_delay(10) == 3600
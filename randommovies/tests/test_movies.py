@@ -0,0 +1,173 @@
+import pytest
+
+import catalog
+from movies import IncompleteCatalogError, MovieManager, decode_cursor, encode_cursor, page_of_ids
+from ranking import get_path
+from transport import GraphQLError
+
+
+@pytest.fixture
+def manager(transport):
+    return MovieManager(transport=transport, page_size=50, fetch_concurrency=4)
+
+
+def count_calls(monkeypatch, transport):
+    """Records the variables of every query the transport sends"""
+    calls = []
+    execute = transport.execute
+
+    def counting(query, variables=None, **kwargs):
+        calls.append(variables)
+        return execute(query, variables, **kwargs)
+
+    monkeypatch.setattr(transport, "execute", counting)
+    return calls
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("573a1390f29313caabcd4135")) == "573a1390f29313caabcd4135"
+    for cursor in ("garbage", encode_cursor("x")[:-2], "e30"):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+def test_page_of_ids_starts_after_the_cursor_id():
+    index = ("a", "c", "e", "g")
+    assert page_of_ids(index, None, 2) == (["a", "c"], encode_cursor("c"), 4)
+    # The id of the cursor need not be in the index any more
+    assert page_of_ids(index, "d", 2) == (["e", "g"], None, 4)
+    assert page_of_ids(index, "g", 2) == ([], None, 4)
+
+
+def test_paging_lists_every_id_once(manager, movies):
+    seen = []
+    page, cursor, total = manager.get_movie_ids_page(limit=70)
+    seen += page
+    while cursor:
+        page, cursor, total = manager.get_movie_ids_page(cursor, 70)
+        seen += page
+
+    assert total == len(movies)
+    assert seen == sorted(movie["_id"] for movie in movies)
+
+
+def test_paging_survives_catalog_refreshes(manager, movies):
+    first, cursor, _ = manager.get_movie_ids_page(limit=100)
+    # Movies before and after the cursor change between two pages
+    removed = {movie["_id"] for movie in movies[:30]}
+    del movies[:30]
+    movies.append(dict(catalog.make_movies(1, seed=1)[0], _id="ffffffffffffffffffffffff"))
+    manager.catalog_cache.invalidate()
+
+    seen = list(first)
+    while cursor:
+        page, cursor, _ = manager.get_movie_ids_page(cursor, 100)
+        seen += page
+
+    assert len(seen) == len(set(seen))
+    assert seen == sorted(seen)
+    assert set(seen) >= {movie["_id"] for movie in movies}
+    assert set(seen) - {movie["_id"] for movie in movies} <= removed
+
+
+def test_malformed_cursors_are_rejected(manager):
+    with pytest.raises(ValueError):
+        manager.get_movie_ids_page("garbage")
+
+
+def test_iter_movie_ids_streams_the_whole_catalog(manager, movies):
+    assert list(manager.iter_movie_ids()) == [movie["_id"] for movie in movies]
+
+
+def test_catalog_load_fetches_every_page(manager, movies):
+    assert manager._fetch_all_movies("ids") == [{"_id": movie["_id"]} for movie in movies]
+
+
+def test_failed_page_fails_the_whole_load(manager, transport, monkeypatch):
+    execute = transport.execute
+
+    def flaky(query, variables=None, **kwargs):
+        if variables and variables.get("skip") == 100:
+            raise GraphQLError([{"message": "boom"}])
+        return execute(query, variables, **kwargs)
+
+    monkeypatch.setattr(transport, "execute", flaky)
+    with pytest.raises(GraphQLError):
+        manager._fetch_all_movies("ids")
+
+
+def test_short_catalog_fails_the_whole_load(manager, transport, monkeypatch):
+    execute = transport.execute
+
+    def short(query, variables=None, **kwargs):
+        data = execute(query, variables, **kwargs)
+        if variables and variables.get("skip") == 100:
+            data["films"] = data["films"][:10]
+        return data
+
+    monkeypatch.setattr(transport, "execute", short)
+    with pytest.raises(IncompleteCatalogError):
+        manager._fetch_all_movies("ids")
+
+
+def test_partial_catalog_is_never_cached(manager, transport, monkeypatch, movies):
+    ids = manager.get_all_movie_ids()
+    manager.catalog_cache.invalidate()
+    execute = transport.execute
+
+    def failing(query, variables=None, **kwargs):
+        if variables and variables.get("skip") == 100:
+            raise GraphQLError([{"message": "boom"}])
+        return execute(query, variables, **kwargs)
+
+    monkeypatch.setattr(transport, "execute", failing)
+    with pytest.raises(GraphQLError):
+        manager.get_all_movie_ids()
+    assert manager.catalog_cache.stats()["entries"] == 0
+
+    monkeypatch.setattr(transport, "execute", execute)
+    assert manager.get_all_movie_ids() == ids
+
+
+def test_missing_movies_are_negatively_cached(manager, transport, monkeypatch, movies):
+    calls = count_calls(monkeypatch, transport)
+    missing = "ffffffffffffffffffffffff"
+
+    assert manager.get_movie_by_id(missing) is None
+    assert manager.get_movie_by_id(missing) is None
+    assert len(calls) == 1
+
+    movie = manager.get_movie_by_id(movies[0]["_id"], "ids")
+    assert movie == {"_id": movies[0]["_id"]}
+    assert manager.get_movie_by_id(movies[0]["_id"], "ids") == movie
+    assert len(calls) == 2
+    assert manager.movie_cache.stats()["negative_hits"] == 1
+
+
+def test_invalid_ids_are_rejected_without_an_upstream_call(manager, transport, monkeypatch):
+    calls = count_calls(monkeypatch, transport)
+    assert manager.get_movie_by_id("not-an-id") is None
+    assert calls == []
+
+
+def test_batch_lookup_uses_one_query(manager, transport, monkeypatch, movies):
+    calls = count_calls(monkeypatch, transport)
+    wanted = [movies[3]["_id"], movies[1]["_id"], movies[3]["_id"], "ffffffffffffffffffffffff", "bad"]
+
+    found, not_found = manager.get_movies_by_ids(wanted, "ids")
+    assert found == [{"_id": movies[3]["_id"]}, {"_id": movies[1]["_id"]}]
+    assert not_found == ["ffffffffffffffffffffffff", "bad"]
+    assert len(calls) == 1
+
+
+def test_random_movies_are_distinct_and_reproducible(manager):
+    drawn = manager.get_random_movies(10, "ids", seed=3)
+    assert drawn == manager.get_random_movies(10, "ids", seed=3)
+    assert len({movie["_id"] for movie in drawn}) == 10
+
+
+def test_top_movies_are_ranked(manager, movies):
+    top = manager.get_top_movies(5, "ranking")
+    ratings = [movie["imdb"]["rating"] for movie in top]
+    assert ratings == sorted(ratings, reverse=True)
+    assert ratings[0] == max(get_path(movie, "imdb.rating") or 0 for movie in movies)
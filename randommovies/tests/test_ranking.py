@@ -0,0 +1,48 @@
+import math
+
+import catalog
+from ranking import RANKING_KEYS, RatingIndex, get_path
+
+
+def expected_top(movies, key, n):
+    rated = [(get_path(movie, key), i) for i, movie in enumerate(movies) if get_path(movie, key) is not None]
+    # Best first, catalog order among ties
+    rated.sort(key=lambda pair: (-pair[0], pair[1]))
+    return [(value, movies[i]["_id"]) for value, i in rated[:n]]
+
+
+def test_top_n_matches_a_full_sort():
+    movies = catalog.make_movies(500)
+    index = RatingIndex(movies, depth=50)
+    for key in RANKING_KEYS:
+        assert index.top_n(key, 20) == expected_top(movies, key, 20)
+        # Past the presorted depth it falls back to a heap over the column
+        assert index.top_n(key, 120) == expected_top(movies, key, 120)
+
+
+def test_missing_values_are_never_ranked():
+    movies = [
+        {"_id": "a", "imdb": {"rating": 7.0}},
+        {"_id": "b", "imdb": {}},
+        {"_id": "c", "imdb": {"rating": "n/a"}},
+        {"_id": "d", "imdb": {"rating": 9.0}},
+        {"imdb": {"rating": 10.0}},
+    ]
+    index = RatingIndex(movies)
+    assert len(index) == 4
+    assert index.top_n("imdb.rating", 10) == [(9.0, "d"), (7.0, "a")]
+    assert math.isnan(index.columns["imdb.rating"][1])
+
+
+def test_unknown_keys_and_empty_requests():
+    index = RatingIndex(catalog.make_movies(10))
+    assert index.top_n("imdb.unknown", 5) == []
+    assert index.top_n("imdb.rating", 0) == []
+
+
+def test_from_columns_matches_building_from_movies():
+    movies = catalog.make_movies(200)
+    built = RatingIndex(movies, depth=30)
+    rebuilt = RatingIndex.from_columns(built.ids, built.columns, depth=30)
+    for key in RANKING_KEYS:
+        assert rebuilt.top_n(key, 30) == built.top_n(key, 30)
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(params=["flask", "asgi"])
+def client(request):
+    """Test client of each serving mode; both must answer alike"""
+    if request.param == "flask":
+        import app
+
+        return app.app.test_client()
+    import asgi
+
+    return TestClient(asgi.app)
+
+
+@pytest.mark.parametrize("path", ["/random-movies/abc", "/random-movies/-1", "/top-movies/1.5"])
+def test_counts_that_are_not_integers_are_not_found(client, path):
+    response = client.get(path)
+    assert response.status_code == 404
+    assert json.loads(response.text) == {"error": "Endpoint not found"}
+
+
+def test_zero_count_is_rejected(client):
+    response = client.get("/random-movies/0")
+    assert response.status_code == 400
+    assert json.loads(response.text) == {"error": "Parameter 'n' must be positive"}
@@ -0,0 +1,33 @@
+from sampling import MovieSampler
+
+IDS = tuple(f"m{i}" for i in range(50))
+
+
+def test_sample_draws_distinct_ids():
+    picked = MovieSampler().sample(IDS, 20)
+    assert len(picked) == 20
+    assert len(set(picked)) == 20
+    assert set(picked) <= set(IDS)
+
+
+def test_sample_is_capped_by_the_catalog_size():
+    assert sorted(MovieSampler().sample(IDS, 100)) == sorted(IDS)
+    assert MovieSampler().sample(IDS, 0) == []
+    assert MovieSampler().sample((), 5) == []
+
+
+def test_seeded_draws_are_reproducible():
+    assert MovieSampler().sample(IDS, 10, seed=7) == MovieSampler().sample(IDS, 10, seed=7)
+
+
+def test_avoid_repeats_skips_recent_draws():
+    sampler = MovieSampler(history_size=30)
+    first = sampler.sample(IDS, 15, avoid_repeats=True)
+    second = sampler.sample(IDS, 15, avoid_repeats=True)
+    assert not set(first) & set(second)
+
+
+def test_avoid_repeats_falls_back_when_too_few_ids_remain():
+    sampler = MovieSampler(history_size=100)
+    sampler.sample(IDS, 40, avoid_repeats=True)
+    assert len(sampler.sample(IDS, 20, avoid_repeats=True)) == 20
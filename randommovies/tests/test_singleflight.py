@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution(wait_for):
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    executions = []
+
+    def fetch():
+        executions.append(1)
+        started.set()
+        release.wait(5)
+        return "catalog"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flights.do, "catalog", fetch)
+        started.wait(5)
+        followers = [executor.submit(flights.do, "catalog", fetch) for _ in range(3)]
+        wait_for(lambda: flights.stats()["coalesced"] == 3)
+        release.set()
+        results = [leader.result()] + [future.result() for future in followers]
+
+    assert results == ["catalog"] * 4
+    assert len(executions) == 1
+    assert flights.stats() == {"calls": 4, "executions": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_errors_are_shared_and_not_remembered(wait_for):
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flights.do, "catalog", fail)
+        started.wait(5)
+        follower = executor.submit(flights.do, "catalog", fail)
+        wait_for(lambda: flights.stats()["coalesced"] == 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    assert flights.do("catalog", lambda: "retried") == "retried"
+
+
+def test_different_keys_run_separately():
+    flights = SingleFlight()
+    assert flights.do("a", lambda: 1) == 1
+    assert flights.do("b", lambda: 2) == 2
+    assert flights.stats()["executions"] == 2
+
+
+def test_async_calls_share_one_task():
+    async def scenario():
+        flights = AsyncSingleFlight()
+        executions = []
+
+        async def fetch():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            return "catalog"
+
+        results = await asyncio.gather(*(flights.do("catalog", fetch) for _ in range(5)))
+        assert results == ["catalog"] * 5
+        assert len(executions) == 1
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_async_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flights = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "catalog"
+
+        first = asyncio.create_task(flights.do("catalog", fetch))
+        second = asyncio.create_task(flights.do("catalog", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "catalog"
+
+    asyncio.run(scenario())
@@ -0,0 +1,200 @@
+"""Metrics of the service, kept and exposed in the Prometheus format by prometheus_client.
+
+StatsCollector, MetricsMiddleware and peak_resident_bytes are copied in
+randommovies/app/metrics.py, as the two services have separate Docker build
+contexts; keep both copies in step.
+"""
+
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram, disable_created_metrics
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from pymongo import monitoring
+
+# With metrics off, the request, MongoDB and training hooks are not installed
+METRICS_ENABLED = (os.environ.get("METRICS_ENABLED") or "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608, 33554432)
+# Keys of stats() dicts that are levels rather than running counts
+GAUGE_STATS = {"entries", "bytes", "max_entries", "max_bytes", "ttl", "in_flight", "hit_rate"}
+
+# Only <name>_total for counters, without the <name>_created timestamps
+disable_created_metrics()
+
+
+class StatsCollector(Collector):
+    """Metric families read at scrape time from {label value: stats() dict}.
+
+    Running counts become counters named <prefix>_<key>_total, the keys in
+    GAUGE_STATS become gauges named <prefix>_<key>. Nothing is reported
+    until the serving app sets stats.
+    """
+
+    def __init__(self, prefix, label, stats=None):
+        self.prefix = prefix
+        self.label = label
+        self.stats = stats
+
+    def collect(self):
+        if self.stats is None:
+            return
+        try:
+            groups = self.stats()
+        except Exception as e:
+            print(f"Error collecting metrics: {e}")
+            return
+        families = {}
+        for group, stats in groups.items():
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                family = families.get(key)
+                if family is None:
+                    kind = GaugeMetricFamily if key in GAUGE_STATS else CounterMetricFamily
+                    family = families[key] = kind(f"{self.prefix}_{key}", f"{key} of {self.prefix}", labels=[self.label])
+                family.add_metric([group], value)
+        yield from families.values()
+
+
+def resident_bytes():
+    """Current resident set size of this process, or None where unknown"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_resident_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PhaseTimer:
+    """Seconds and resident memory growth of the phases of a long task.
+
+    Phases are accumulated between start() and publish(), so a phase that
+    runs once per chunk reports its total. publish() sets the gauges.
+    """
+
+    def __init__(self, seconds, memory):
+        self.seconds = seconds
+        self.memory = memory
+        self._totals = {}
+
+    def start(self):
+        self._totals = {}
+
+    @contextmanager
+    def phase(self, name):
+        if not METRICS_ENABLED:
+            yield
+            return
+        rss, started = resident_bytes(), time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            growth = (resident_bytes() or 0) - (rss or 0)
+            seconds, memory = self._totals.get(name, (0.0, 0))
+            self._totals[name] = (seconds + elapsed, memory + growth)
+
+    def publish(self):
+        for name, (seconds, memory) in self._totals.items():
+            self.seconds.labels(name).set(seconds)
+            self.memory.labels(name).set(memory)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route and counting response bytes.
+
+    The time runs until the last body chunk is sent, so streamed responses
+    are measured whole.
+    """
+
+    def __init__(self, app, duration, size):
+        self.app = app
+        self.duration = duration
+        self.size = size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status, sent = 500, 0
+
+        async def send_and_measure(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            # The router stores the matched route in the scope; its path is the template
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.duration.labels(scope["method"], route, status).observe(time.perf_counter() - started)
+            self.size.labels(scope["method"], route).observe(sent)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every command sent by every MongoClient, sync or async."""
+
+    def __init__(self, duration):
+        self.duration = duration
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.duration.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.duration.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
+
+
+REQUEST_SECONDS = Histogram(
+    "recomendador_http_request_duration_seconds", "Time to serve HTTP requests",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+RESPONSE_BYTES = Histogram(
+    "recomendador_http_response_bytes", "Size of HTTP response bodies",
+    ["method", "route"], buckets=SIZE_BUCKETS)
+MONGO_SECONDS = Histogram(
+    "recomendador_mongo_command_duration_seconds", "Time of MongoDB commands, by command name",
+    ["command", "outcome"], buckets=LATENCY_BUCKETS)
+TRAIN_PHASE_SECONDS = Gauge(
+    "recomendador_train_phase_seconds", "Seconds spent in each phase of the last training",
+    ["phase"])
+TRAIN_PHASE_MEMORY = Gauge(
+    "recomendador_train_phase_memory_bytes", "Resident memory growth during each phase of the last training",
+    ["phase"])
+TRAININGS = Counter("recomendador_trainings_total", "Completed model trainings")
+TRAIN_PHASES = PhaseTimer(TRAIN_PHASE_SECONDS, TRAIN_PHASE_MEMORY)
+# Read from the serving model when scraped; main.py sets their functions
+MODEL_MOVIES = Gauge("recomendador_model_movies", "Movies in the loaded model")
+MODEL_READY = Gauge("recomendador_model_ready", "Whether a model is loaded and serving")
+MODEL_REBUILDING = Gauge("recomendador_model_rebuilding", "Whether a model build is running")
+# prometheus_client's process collector reports the current resident memory
+PEAK_RESIDENT_BYTES = Gauge("process_peak_resident_memory_bytes", "Peak resident memory size in bytes")
+PEAK_RESIDENT_BYTES.set_function(peak_resident_bytes)
+
+# main.py points it at the response cache stats
+RESPONSE_CACHE_STATS = StatsCollector("recomendador_response_cache", "cache")
+REGISTRY.register(RESPONSE_CACHE_STATS)
+
+
+def instrument_mongo():
+    """Time the commands of MongoClients created from now on"""
+    if METRICS_ENABLED:
+        monitoring.register(MongoCommandMetrics(MONGO_SECONDS))
@@ -0,0 +1,131 @@
+"""Top-k nearest neighbor index over the movie vectors."""
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+
+class NeighborIndex:
+    """Keeps, for every movie, only its k most similar movies.
+
+    ``neighbors[i]`` holds the positions of the k movies most similar to movie
+    i (itself excluded), by decreasing cosine similarity and then increasing
+    position, and ``scores[i]`` the matching similarities. Memory is O(N*k)
+    instead of the O(N^2) of a dense similarity matrix.
+    """
+
+    def __init__(self, neighbors, scores):
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    def __len__(self):
+        return self.neighbors.shape[0]
+
+    @classmethod
+    def build(cls, vectors, k=50, block_size=256):
+        """Build the index from L2-normalized (movies x features) sparse vectors.
+
+        Cosine similarities are computed ``block_size`` rows at a time, so peak
+        memory is one dense block of block_size x N scores plus the index.
+        """
+        n_movies = vectors.shape[0]
+        k = max(0, min(k, n_movies - 1))
+        neighbors = np.empty((n_movies, k), dtype=np.int32)
+        scores = np.empty((n_movies, k), dtype=np.float32)
+        if k > 0:
+            _fill_rows(neighbors, scores, vectors, np.arange(n_movies), block_size)
+        return cls(neighbors, scores)
+
+    def updated(self, vectors, changed, block_size=256):
+        """Return the index for vectors, where only the rows in changed differ.
+
+        Rows past the end of this index are new movies and must be in changed.
+        Movies that had a changed movie as a neighbor are recomputed in full,
+        since it may have dropped out of their top k; every other movie can
+        only gain changed movies, which are merged into its current neighbors.
+        The cost grows with the number of changed movies, not with N^2.
+        """
+        n_movies, n_old, k = vectors.shape[0], len(self), self.k
+        changed = np.unique(np.asarray(changed, dtype=np.int64))
+
+        neighbors = np.empty((n_movies, k), dtype=np.int32)
+        scores = np.empty((n_movies, k), dtype=np.float32)
+        neighbors[:n_old] = self.neighbors
+        scores[:n_old] = self.scores
+        if k == 0 or len(changed) == 0:
+            return NeighborIndex(neighbors, scores)
+
+        is_changed = np.zeros(n_movies, dtype=bool)
+        is_changed[changed] = True
+        dirty = is_changed.copy()
+        dirty[:n_old] |= is_changed[self.neighbors].any(axis=1)
+        clean = np.flatnonzero(~dirty)
+
+        vectors_t = vectors.T.tocsc()
+        for start in range(0, len(changed), block_size):
+            rows = changed[start:start + block_size]
+            # Similarity of every clean movie (rows) to this chunk of changed movies (columns)
+            block = (vectors[rows] @ vectors_t).toarray().T[clean]
+            # A changed movie tied with the last neighbor may still win on position
+            gains = np.flatnonzero(block.max(axis=1) >= scores[clean, -1])
+            if len(gains) == 0:
+                continue
+            targets = clean[gains]
+            candidates = np.concatenate(
+                (neighbors[targets], np.broadcast_to(rows, (len(targets), len(rows)))), axis=1)
+            candidate_scores = np.concatenate((scores[targets], block[gains]), axis=1)
+            top, top_scores = top_k(candidate_scores, k, positions=candidates)
+            neighbors[targets] = np.take_along_axis(candidates, top, axis=1)
+            scores[targets] = top_scores
+
+        _fill_rows(neighbors, scores, vectors, np.flatnonzero(dirty), block_size, vectors_t)
+        return NeighborIndex(neighbors, scores)
+
+    def get(self, idx):
+        """Neighbor positions and similarities of the movie at position idx"""
+        return self.neighbors[idx], self.scores[idx]
+
+
+def normalize_vectors(matrix):
+    """L2-normalize a sparse (movies x features) count matrix as float32 CSR."""
+    return normalize(matrix.astype(np.float32), norm='l2', copy=True).tocsr()
+
+
+def top_k(block, k, positions=None):
+    """Column positions and values of the k largest values of each row, decreasing.
+
+    Equal values are ordered by movie position, lowest first, as a stable
+    sort of the whole row would: positions gives the movie of every cell and
+    defaults to the column.
+    """
+    top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    kth = np.take_along_axis(block, top, axis=1).min(axis=1)
+    # argpartition cuts a run of values tied with the k-th anywhere; redo those rows exactly
+    for row in np.flatnonzero(np.count_nonzero(block >= kth[:, None], axis=1) > k):
+        values = block[row]
+        above = np.flatnonzero(values > kth[row])
+        equal = np.flatnonzero(values == kth[row])
+        if positions is not None:
+            equal = equal[np.argsort(positions[row, equal], kind='stable')]
+        top[row] = np.concatenate((above, equal[:k - len(above)]))
+    if positions is None:
+        positions = np.broadcast_to(np.arange(block.shape[1]), block.shape)
+    top_scores = np.take_along_axis(block, top, axis=1)
+    order = np.lexsort((np.take_along_axis(positions, top, axis=1), -top_scores), axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def _fill_rows(neighbors, scores, vectors, rows, block_size, vectors_t=None):
+    """Compute the neighbors of the movies at positions rows, block by block"""
+    if vectors_t is None:
+        vectors_t = vectors.T.tocsc()
+    k = neighbors.shape[1]
+    for start in range(0, len(rows), block_size):
+        block_rows = rows[start:start + block_size]
+        block = (vectors[block_rows] @ vectors_t).toarray()
+        # A movie is never its own neighbor
+        block[np.arange(len(block_rows)), block_rows] = -np.inf
+        neighbors[block_rows], scores[block_rows] = top_k(block, k)
@@ -0,0 +1,122 @@
+"""Data access for user ratings (ratings_db.ratings)."""
+
+import os
+from pymongo import AsyncMongoClient, MongoClient, ASCENDING, DESCENDING
+
+# Connection pool settings for the ratings database
+RATINGS_POOL_SIZE = int(os.environ.get("RATINGS_POOL_SIZE") or 50)
+RATINGS_TIMEOUT_MS = int(os.environ.get("RATINGS_TIMEOUT_MS") or 5000)
+
+RATINGS_DATABASE = "ratings_db"
+# Supports the lookup by email sorted by rating and timestamp
+RATINGS_INDEX = [("email", ASCENDING), ("rating", DESCENDING), ("timestamp", DESCENDING)]
+RATINGS_SORT = [("rating", DESCENDING), ("timestamp", DESCENDING)]
+RATINGS_PROJECTION = {"_id": 0, "movieId": 1, "rating": 1, "timestamp": 1}
+
+
+def _fingerprint_pipeline(email):
+    return [
+        {"$match": {"email": email}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "latest": {"$max": "$timestamp"}}},
+    ]
+
+
+def _users_ratings_pipeline(emails):
+    return [
+        {"$match": {"email": {"$in": emails}}},
+        {"$group": {"_id": "$email", "ratings": {"$push": {"movieId": "$movieId", "rating": "$rating"}}}},
+    ]
+
+
+def _fingerprint(summary):
+    if not summary:
+        return None
+    return summary[0]["count"], str(summary[0]["latest"])
+
+
+def _group_ratings(emails, grouped):
+    users_ratings = {email: [] for email in emails}
+    for user in grouped:
+        users_ratings[user["_id"]] = [(r.get("movieId"), r.get("rating")) for r in user["ratings"]]
+    return users_ratings
+
+
+class RatingsStore:
+    """Long-lived, pooled access to the ratings collection.
+
+    The MongoClient is created on first use and shared by every request; it
+    keeps a pool of up to RATINGS_POOL_SIZE authenticated connections.
+    """
+
+    def __init__(self, connection_string, database_name=RATINGS_DATABASE,
+                 pool_size=RATINGS_POOL_SIZE, timeout_ms=RATINGS_TIMEOUT_MS):
+        self.connection_string = connection_string
+        self.database_name = database_name
+        self.pool_size = pool_size
+        self.timeout_ms = timeout_ms
+        self._client = None
+
+    def _client_options(self):
+        return {
+            "maxPoolSize": self.pool_size,
+            "serverSelectionTimeoutMS": self.timeout_ms,
+            "connectTimeoutMS": self.timeout_ms,
+        }
+
+    @property
+    def collection(self):
+        if self._client is None:
+            self._client = MongoClient(self.connection_string, **self._client_options())
+        # Force database name if not in connection string
+        return self._client[self.database_name].ratings
+
+    def ensure_indexes(self):
+        """Create the (email, rating, timestamp) index if it does not exist."""
+        self.collection.create_index(RATINGS_INDEX, name="email_rating_timestamp")
+
+    def get_user_ratings(self, email):
+        """Ratings of a user, best rated and most recent first."""
+        return list(self.collection.find({"email": email}, RATINGS_PROJECTION).sort(RATINGS_SORT))
+
+    def get_fingerprint(self, email):
+        """(count, latest timestamp) of a user's ratings, None if there are none."""
+        return _fingerprint(list(self.collection.aggregate(_fingerprint_pipeline(email))))
+
+    def get_users_ratings(self, emails):
+        """Ratings of several users, as {email: [(movieId, rating), ...]}, in one query."""
+        return _group_ratings(emails, self.collection.aggregate(_users_ratings_pipeline(emails)))
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class AsyncRatingsStore(RatingsStore):
+    """RatingsStore for async handlers, built on pymongo's AsyncMongoClient."""
+
+    @property
+    def collection(self):
+        if self._client is None:
+            self._client = AsyncMongoClient(self.connection_string, **self._client_options())
+        return self._client[self.database_name].ratings
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(RATINGS_INDEX, name="email_rating_timestamp")
+
+    async def get_user_ratings(self, email):
+        cursor = self.collection.find({"email": email}, RATINGS_PROJECTION).sort(RATINGS_SORT)
+        return await cursor.to_list(None)
+
+    async def get_fingerprint(self, email):
+        cursor = await self.collection.aggregate(_fingerprint_pipeline(email))
+        return _fingerprint(await cursor.to_list(None))
+
+    async def get_users_ratings(self, emails):
+        cursor = await self.collection.aggregate(_users_ratings_pipeline(emails))
+        return _group_ratings(emails, await cursor.to_list(None))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
@@ -1,30 +1,126 @@
 """[TADW 2025] - Sistemas de recomendación"""
 
+import copy
+from itertools import islice
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from collections import Counter
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
 import os
+import time
 import warnings
+from neighbors import NeighborIndex, normalize_vectors, top_k
+from metrics import TRAIN_PHASES, TRAININGS
+import snapshot
 
 warnings.filterwarnings('ignore')
 
+# Number of neighbors kept per movie and rows scored per block when building them
+NEIGHBORS_K = int(os.environ.get("NEIGHBORS_K") or 50)
+SIMILARITY_BLOCK_SIZE = int(os.environ.get("SIMILARITY_BLOCK_SIZE") or 256)
+# Defaults for the hybrid ranking: hybrid_score = sim_score * average_rating ** RATING_WEIGHT
+MIN_SIMILARITY = float(os.environ.get("MIN_SIMILARITY") or 0.0)
+RATING_WEIGHT = float(os.environ.get("RATING_WEIGHT") or 1.0)
+# Where trained models are saved to and loaded from, and how many are kept
+MODEL_SNAPSHOT_DIR = os.environ.get("MODEL_SNAPSHOT_DIR") or "snapshots"
+MODEL_SNAPSHOT_KEEP = int(os.environ.get("MODEL_SNAPSHOT_KEEP") or 3)
+# Movie documents read from the cursor and cleaned per chunk while training
+MOVIE_LOAD_BATCH_SIZE = int(os.environ.get("MOVIE_LOAD_BATCH_SIZE") or 2000)
+# Users scored together by one matrix product in batch recommendations
+USER_BATCH_SIZE = int(os.environ.get("USER_BATCH_SIZE") or 256)
+
+# Movies the recommender is trained on, and the fields it loads for them
+MOVIE_FILTER = {
+    "title": {"$exists": True},
+    "imdb.rating": {"$exists": True, "$ne": ""},
+    "imdb.votes": {"$exists": True, "$ne": ""},
+    "genres": {"$exists": True, "$ne": []},
+    "cast": {"$exists": True, "$ne": []}
+}
+MOVIE_PROJECTION = {
+    "_id": 1, # Include _id
+    "title": 1,
+    "year": 1,
+    "genres": 1,
+    "cast": 1,
+    "directors": 1,
+    "writers": 1,
+    "plot": 1,
+    "fullplot": 1,
+    "imdb.rating": 1,
+    "imdb.votes": 1,
+    "tomatoes.viewer.rating": 1,
+    "tomatoes.viewer.numReviews": 1,
+    "awards": 1,
+    "languages": 1,
+    "countries": 1,
+    "type": 1,
+    "runtime": 1,
+    "poster": 1,
+    "lastupdated": 1,
+}
+
+def iter_chunks(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def of_type(series, kind):
+    """series with every value that is not a kind (list, dict...) replaced by NaN."""
+    return series.astype(object).where(series.map(type).eq(kind))
+
+def flatten_movies(docs):
+    """Frame of movie documents with the nested imdb and tomatoes fields as typed columns."""
+    df = pd.DataFrame(docs)
+    for column in ('_id', 'title', 'imdb', 'tomatoes', 'genres', 'cast', 'directors'):
+        if column not in df.columns:
+            df[column] = None
+    
+    imdb = of_type(df.pop('imdb'), dict).str
+    viewer = of_type(of_type(df.pop('tomatoes'), dict).str.get('viewer'), dict).str
+    df['imdb_rating'] = pd.to_numeric(imdb.get('rating'), errors='coerce')
+    df['imdb_votes'] = pd.to_numeric(imdb.get('votes'), errors='coerce')
+    df['tomato_rating'] = pd.to_numeric(viewer.get('rating'), errors='coerce')
+    df['tomato_count'] = pd.to_numeric(viewer.get('numReviews'), errors='coerce')
+    return df
+
+def soup_vectorizer(vocabulary=None):
+    """Word and bigram counter of movie soups; with a vocabulary it needs no fitting."""
+    return CountVectorizer(analyzer='word', ngram_range=(1, 2), min_df=0.0, stop_words='english',
+                           vocabulary=vocabulary)
+
+def connect(connection_string):
+    """MongoClient of the movies database; a process shares one between its models."""
+    return MongoClient(connection_string)
+
 class Recommender:
-    def __init__(self, connection_string):
+    def __init__(self, connection_string, k=NEIGHBORS_K, block_size=SIMILARITY_BLOCK_SIZE, client=None):
         self.connection_string = connection_string
-        self.client = None
+        self.k = k
+        self.block_size = block_size
+        self.client = client # Created by connect_to_mongodb unless one is shared
         self.movies = None
-        self.cosine_sim = None
+        self.neighbor_index = None # Top-k similar movies of every movie
+        self.ratings = None # average_rating by position, as a float array
+        self.active = None # False for positions of movies removed by an update
+        self.vectorizer = None
+        self.vectors = None # Normalized soup vectors by position
+        self.id_to_position = None
+        self.watermark = None # Newest lastupdated and _id seen in the collection
         self.indices = None
         self.id_to_title = None # Map _id to title for quick lookup
+        self.version = None # Snapshot version of the loaded model
+        self.trained_at = None # Time of the last full training; incremental updates keep it
 
     def connect_to_mongodb(self):
         """Connect to MongoDB and return database client."""
         try:
-            self.client = MongoClient(self.connection_string)
+            if self.client is None:
+                self.client = connect(self.connection_string)
             self.client.admin.command('ping')
             print("Successfully connected to MongoDB!")
             return True
@@ -32,8 +128,12 @@ class Recommender:
             print(f"Could not connect to MongoDB: {e}")
             return False
 
-    def load_mflix_data(self, database_name="sample_mflix"):
-        """Load movies data from MFlix database."""
+    def load_mflix_data(self, database_name="sample_mflix", batch_size=MOVIE_LOAD_BATCH_SIZE):
+        """Load and clean movies data from MFlix database, batch_size movies at a time.
+
+        Every chunk is flattened and filtered before the next one is read, so
+        raw documents are never all held in memory at once.
+        """
         if not self.client:
             print("MongoDB client not connected.")
             return pd.DataFrame()
@@ -41,64 +141,41 @@ class Recommender:
         db = self.client[database_name]
         movies_collection = db.movies
         
-        movies_data = list(movies_collection.find(
-            {
-                "title": {"$exists": True},
-                "imdb.rating": {"$exists": True, "$ne": ""},
-                "imdb.votes": {"$exists": True, "$ne": ""},
-                "genres": {"$exists": True, "$ne": []},
-                "cast": {"$exists": True, "$ne": []}
-            },
-            {
-                "_id": 1, # Include _id
-                "title": 1,
-                "year": 1,
-                "genres": 1,
-                "cast": 1,
-                "directors": 1,
-                "writers": 1,
-                "plot": 1,
-                "fullplot": 1,
-                "imdb.rating": 1,
-                "imdb.votes": 1,
-                "tomatoes.viewer.rating": 1,
-                "tomatoes.viewer.numReviews": 1,
-                "awards": 1,
-                "languages": 1,
-                "countries": 1,
-                "type": 1,
-                "runtime": 1,
-                "poster": 1,
-            }
-        ))
-        
-        return pd.DataFrame(movies_data)
+        cursor = movies_collection.find(MOVIE_FILTER, MOVIE_PROJECTION, batch_size=batch_size)
+        chunks, loaded = [], 0
+        pending = iter_chunks(cursor, batch_size)
+        while True:
+            with TRAIN_PHASES.phase("load"):
+                docs = next(pending, None)
+                if docs is None:
+                    break
+                raw = flatten_movies(docs)
+                loaded += len(raw)
+                self.advance_watermark(raw)
+            with TRAIN_PHASES.phase("clean"):
+                chunks.append(self.clean_mflix_data(raw))
+        print(f"Loaded {loaded} movies from MongoDB")
+        
+        if not chunks:
+            return pd.DataFrame()
+        # Row labels double as positions in the neighbor index
+        return pd.concat(chunks, ignore_index=True)
 
     def clean_mflix_data(self, df):
-        """Clean and prepare MFlix movies data."""
+        """Clean and prepare flattened MFlix movies data."""
         df_clean = df.copy()
         
-        # Flatten imdb fields
-        df_clean['imdb_rating'] = df_clean['imdb'].apply(lambda x: x.get('rating') if isinstance(x, dict) else None)
-        df_clean['imdb_votes'] = df_clean['imdb'].apply(lambda x: x.get('votes') if isinstance(x, dict) else None)
-        
         # Process ratings
-        df_clean['average_rating'] = pd.to_numeric(df_clean['imdb_rating'], errors='coerce').fillna(0)
-        df_clean['ratings_count'] = pd.to_numeric(df_clean['imdb_votes'], errors='coerce').fillna(0)
-        
-        if 'tomatoes.viewer.rating' in df_clean.columns:
-            df_clean['tomato_rating'] = pd.to_numeric(df_clean['tomatoes.viewer.rating'], errors='coerce')
-            df_clean['tomato_count'] = pd.to_numeric(df_clean['tomatoes.viewer.numReviews'], errors='coerce')
+        df_clean['average_rating'] = df_clean['imdb_rating'].fillna(0)
+        df_clean['ratings_count'] = df_clean['imdb_votes'].fillna(0)
         
         # Process list fields
-        df_clean['genres_str'] = df_clean['genres'].apply(
-            lambda x: ', '.join(x) if isinstance(x, list) else ''
-        )
-        df_clean['cast_str'] = df_clean['cast'].apply(
-            lambda x: ', '.join(x[:5]) if isinstance(x, list) and len(x) > 0 else ''
-        )
-        df_clean['directors_clean'] = df_clean['directors'].apply(
-            lambda x: ', '.join(str.lower(i.replace(" ", "")) for i in x) if isinstance(x, list) else ''
+        df_clean['genres_str'] = of_type(df_clean['genres'], list).str.join(', ').fillna('')
+        df_clean['cast_str'] = of_type(df_clean['cast'], list).str[:5].str.join(', ').fillna('')
+        df_clean['directors_clean'] = (
+            of_type(df_clean['directors'], list).str.join('\x1f')
+            .str.replace(' ', '', regex=False).str.lower()
+            .str.replace('\x1f', ', ', regex=False).fillna('')
         )
         df_clean['title_clean'] = df_clean['title'].astype(str)
         
@@ -106,7 +183,8 @@ class Recommender:
         df_clean = df_clean[df_clean['ratings_count'] > 0]
         df_clean = df_clean[df_clean['genres_str'].str.strip() != '']
         
-        return df_clean
+        # Row labels double as positions in the neighbor index
+        return df_clean.reset_index(drop=True)
 
     def calculate_weighted_ratings(self, movies, percentile=0.95):
         """Calculate weighted ratings for all movies."""
@@ -119,79 +197,347 @@ class Recommender:
 
     def create_soup(self, movies):
         """Create soup combining title, directors, and genres."""
-        movies['soup'] = movies.apply(
-            lambda x: ' '.join([str(x['title_clean']), str(x['directors_clean'] or ''), str(x['genres_str'] or '')]),
-            axis=1
-        )
+        movies['soup'] = movies['title_clean'] + ' ' + movies['directors_clean'] + ' ' + movies['genres_str']
         return movies
 
-    def build_similarity_matrix(self, movies):
-        """Build cosine similarity matrix."""
-        count = CountVectorizer(analyzer='word', ngram_range=(1, 2), min_df=0.0, stop_words='english')
-        count_matrix = count.fit_transform(movies['soup'])
-        return cosine_similarity(count_matrix, count_matrix)
+    def build_neighbor_index(self, movies):
+        """Fit the soup vectorizer and build the top-k cosine similarity neighbor index."""
+        with TRAIN_PHASES.phase("vectorize"):
+            self.vectorizer = soup_vectorizer()
+            self.vectors = normalize_vectors(self.vectorizer.fit_transform(movies['soup']))
+        with TRAIN_PHASES.phase("similarity"):
+            return NeighborIndex.build(self.vectors, k=self.k, block_size=self.block_size)
+
+    def advance_watermark(self, df):
+        """Move the watermark past the raw movie documents in df."""
+        watermark = dict(self.watermark or {})
+        if 'lastupdated' in df.columns:
+            updated = [str(x) for x in df['lastupdated'].dropna()]
+            if updated and max(updated) > watermark.get('lastupdated', ''):
+                watermark['lastupdated'] = max(updated)
+        if '_id' in df.columns and not df.empty:
+            newest = df['_id'].max()
+            if watermark.get('_id') is None or newest > watermark['_id']:
+                watermark['_id'] = newest
+        self.watermark = watermark
 
     def train(self):
         """Initialize the recommender system (load data, build matrices)."""
         if not self.connect_to_mongodb():
             raise Exception("Failed to connect to MongoDB")
 
-        print("Loading data...")
-        movies_df = self.load_mflix_data()
-        if movies_df.empty:
+        print("Loading and cleaning data...")
+        TRAIN_PHASES.start()
+        self.watermark = None
+        self.movies = self.load_mflix_data()
+        if self.movies.empty:
             raise Exception("No movies loaded from MongoDB.")
-        print(f"Loaded {len(movies_df)} movies from MongoDB")
-        
-        print("Cleaning data...")
-        self.movies = self.clean_mflix_data(movies_df)
         print(f"Cleaned to {len(self.movies)} movies")
         
         print("Calculating weighted ratings...")
-        self.movies = self.calculate_weighted_ratings(self.movies)
+        with TRAIN_PHASES.phase("weighted_rating"):
+            self.movies = self.calculate_weighted_ratings(self.movies)
         
-        print("Building similarity matrix...")
-        self.movies = self.create_soup(self.movies)
-        self.cosine_sim = self.build_similarity_matrix(self.movies)
+        print("Building neighbor index...")
+        with TRAIN_PHASES.phase("vectorize"):
+            self.movies = self.create_soup(self.movies)
+        self.neighbor_index = self.build_neighbor_index(self.movies)
+        self.ratings = self.movies['average_rating'].to_numpy(dtype=np.float64)
+        self.active = np.ones(len(self.movies), dtype=bool)
         
         self.indices = pd.Series(self.movies.index, index=self.movies['title'])
         # Create a map from _id to title for easy lookup
-        self.id_to_title = {str(row['_id']): row['title'] for _, row in self.movies.iterrows()}
+        movie_ids = self.movies['_id'].astype(str).to_numpy()
+        self.id_to_title = dict(zip(movie_ids, self.movies['title'].to_numpy()))
+        self.id_to_position = dict(zip(movie_ids, range(len(movie_ids))))
+        self.trained_at = time.time()
         
+        TRAIN_PHASES.publish()
+        TRAININGS.inc()
         print("Recommender training complete.")
 
+    def snapshot_params(self):
+        """Parameters a snapshot must have been built with to be reused."""
+        return {"k": self.k}
+
+    def save_snapshot(self, directory=MODEL_SNAPSHOT_DIR, keep=MODEL_SNAPSHOT_KEEP):
+        """Save the trained model as a new snapshot and return its version."""
+        arrays = {
+            "neighbors": self.neighbor_index.neighbors,
+            "scores": self.neighbor_index.scores,
+            "ratings": self.ratings,
+            "active": self.active,
+            "movies": self.movies,
+            "vectors": self.vectors,
+            # Terms by vector column; the vectorizer is rebuilt from them
+            "vocabulary": pd.DataFrame({"term": self.vectorizer.get_feature_names_out()}),
+        }
+        state = {
+            "indices": self.indices,
+            "id_to_title": self.id_to_title,
+            "id_to_position": self.id_to_position,
+            "watermark": self.watermark,
+            "trained_at": self.trained_at,
+        }
+        self.version = snapshot.save_snapshot(directory, arrays, state, self.snapshot_params(), keep)
+        print(f"Saved model snapshot {self.version}")
+        return self.version
+
+    def load_snapshot(self, directory=MODEL_SNAPSHOT_DIR, version=None):
+        """Load a compatible snapshot, the latest one by default. Returns True on success."""
+        try:
+            loaded = snapshot.load_snapshot(directory, self.snapshot_params(), version)
+        except Exception as e:
+            print(f"Could not load model snapshot: {e}")
+            return False
+        if loaded is None:
+            return False
+
+        self.version, arrays, state = loaded
+        self.neighbor_index = NeighborIndex(arrays["neighbors"], arrays["scores"])
+        self.ratings = arrays["ratings"]
+        self.active = arrays["active"]
+        self.movies = arrays["movies"]
+        self.vectors = arrays["vectors"]
+        self.vectorizer = soup_vectorizer(vocabulary=arrays["vocabulary"]["term"].tolist())
+        self.indices = state["indices"]
+        self.id_to_title = state["id_to_title"]
+        self.id_to_position = state["id_to_position"]
+        self.watermark = state["watermark"]
+        # Snapshots saved before trained_at was recorded count as trained long ago
+        self.trained_at = state.get("trained_at")
+        print(f"Loaded model snapshot {self.version} ({len(self.movies)} movies)")
+        return True
+
+    def fetch_changes(self, changed_ids=(), database_name="sample_mflix"):
+        """Load the movies added or modified since the watermark, plus changed_ids."""
+        if not self.client and not self.connect_to_mongodb():
+            return pd.DataFrame()
+        
+        conditions = [{"_id": {"$in": list(changed_ids)}}] if changed_ids else []
+        if self.watermark and self.watermark.get('lastupdated'):
+            conditions.append({"lastupdated": {"$gt": self.watermark['lastupdated']}})
+        if self.watermark and self.watermark.get('_id') is not None:
+            conditions.append({"_id": {"$gt": self.watermark['_id']}})
+        if not conditions:
+            return pd.DataFrame()
+        
+        movies_collection = self.client[database_name].movies
+        return flatten_movies(list(movies_collection.find({"$or": conditions}, MOVIE_PROJECTION)))
+
+    def apply_changes(self, changed_df, deleted_ids=()):
+        """Return a copy of the model with changed and deleted movies spliced in.
+
+        Only the changed movies are vectorized, with the vocabulary fitted at
+        training time (words first seen in an update are ignored until the
+        next full train). Positions of existing movies never move: movies that
+        no longer pass the filters or were deleted are marked inactive, and new
+        movies are appended.
+        """
+        model = copy.copy(self)
+        model.advance_watermark(changed_df)
+        
+        deleted = {str(movie_id) for movie_id in deleted_ids}
+        if not changed_df.empty:
+            # A changed movie that no longer passes MOVIE_FILTER is dropped by cleaning
+            cleaned = self.clean_mflix_data(changed_df)
+            cleaned = cleaned[cleaned['title'].notna()]
+            cleaned = cleaned[cleaned['imdb_rating'].notna()]
+            cleaned = cleaned[of_type(cleaned['cast'], list).str.len() > 0]
+            cleaned = self.create_soup(cleaned.reset_index(drop=True))
+            deleted |= set(changed_df['_id'].astype(str)) - set(cleaned['_id'].astype(str))
+        else:
+            cleaned = pd.DataFrame()
+        
+        id_to_position = dict(self.id_to_position)
+        n_old = n_movies = len(self.movies)
+        positions = []
+        for movie_id in cleaned['_id'].astype(str) if not cleaned.empty else []:
+            if movie_id not in id_to_position:
+                id_to_position[movie_id] = n_movies
+                n_movies += 1
+            positions.append(id_to_position[movie_id])
+        positions = np.asarray(positions, dtype=np.int64)
+        removed = np.asarray([id_to_position.pop(i) for i in deleted if i in id_to_position], dtype=np.int64)
+        
+        # Movie frame: replace changed rows, append new ones
+        if len(positions):
+            cleaned.index = positions
+            movies = pd.concat([self.movies.drop(index=positions[positions < n_old]), cleaned]).sort_index()
+        else:
+            movies = self.movies.copy()
+        active = np.zeros(n_movies, dtype=bool)
+        active[:n_old] = self.active
+        active[positions] = True
+        active[removed] = False
+        weighted = self.calculate_weighted_ratings(movies[active].copy())['weighted_rating']
+        movies['weighted_rating'] = weighted
+        
+        ratings = np.zeros(n_movies, dtype=np.float64)
+        ratings[:n_old] = self.ratings
+        if len(positions):
+            ratings[positions] = cleaned['average_rating'].to_numpy()
+        ratings[removed] = 0
+        
+        # Vectors: zero the rows of changed and removed movies, then scatter the new ones in
+        changed = np.union1d(positions, removed)
+        keep = np.ones(n_movies, dtype=np.float32)
+        keep[changed] = 0
+        vectors = sp.vstack([self.vectors, sp.csr_matrix((n_movies - n_old, self.vectors.shape[1]), dtype=np.float32)])
+        vectors = sp.diags(keep) @ vectors
+        if len(positions):
+            new_vectors = normalize_vectors(self.vectorizer.transform(cleaned['soup']))
+            scatter = sp.csr_matrix(
+                (np.ones(len(positions), dtype=np.float32), (positions, np.arange(len(positions)))),
+                shape=(n_movies, len(positions)))
+            vectors = vectors + scatter @ new_vectors
+        model.vectors = vectors.tocsr()
+        model.neighbor_index = self.neighbor_index.updated(model.vectors, changed, self.block_size)
+        
+        model.movies = movies
+        model.active = active
+        model.ratings = ratings
+        model.id_to_position = id_to_position
+        active_movies = movies[active]
+        model.indices = pd.Series(active_movies.index, index=active_movies['title'])
+        model.id_to_title = dict(zip(active_movies['_id'].astype(str), active_movies['title']))
+        model.version = None
+        print(f"Applied {len(positions)} changed and {len(removed)} removed movies to the model")
+        return model
+
     def get_movie_index(self, title):
         """Get movie index by title or find most similar."""
         try:
-            return self.indices[title]
+            idx = self.indices[title]
+            # Repeated titles map to several movies; use the first one
+            return int(idx.iloc[0]) if isinstance(idx, pd.Series) else int(idx)
         except KeyError:
             # If exact title not found, try to find a close match or handle gracefully
             # For simplicity, returning None for now. A more robust solution would involve fuzzy matching.
             print(f"Movie title '{title}' not found in index.")
             return None
 
-    def get_recommendations(self, title, n=10, self_exclude=True):
-        """Get hybrid recommendations combining similarity and rating."""
+    def get_recommendations(self, title, n=10, self_exclude=True,
+                            min_similarity=MIN_SIMILARITY, rating_weight=RATING_WEIGHT):
+        """Get hybrid recommendations combining similarity and rating.
+
+        The n most similar movies (at least min_similarity) are ranked by
+        sim_score * average_rating ** rating_weight.
+        """
         idx = self.get_movie_index(title)
         if idx is None:
             return pd.DataFrame() # Return empty if title not found
         
-        sim_scores = list(enumerate(self.cosine_sim[idx]))
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        sim_scores = sim_scores[1:n+1] if self_exclude else sim_scores[0:n+1]
+        # Neighbors are already sorted by similarity, so the top n is a slice
+        neighbors, scores = self.neighbor_index.get(idx)
+        # Skip movies removed by an update
+        live = self.active[neighbors]
+        neighbors, scores = neighbors[live], scores[live]
+        movie_indices = neighbors[:n]
+        cosine_similarities = scores[:n].astype(np.float64)
+        if not self_exclude:
+            movie_indices = np.concatenate(([idx], movie_indices))
+            cosine_similarities = np.concatenate(([1.0], cosine_similarities))
         
-        movie_indices = [i[0] for i in sim_scores]
-        cosine_similarities = [i[1] for i in sim_scores]
+        keep = cosine_similarities >= min_similarity
+        return self.rank_candidates(movie_indices[keep], cosine_similarities[keep], rating_weight)
+
+    def get_user_recommendations(self, user_ratings, n=10,
+                                 min_similarity=MIN_SIMILARITY, rating_weight=RATING_WEIGHT):
+        """Get hybrid recommendations from all the movies a user rated.
+
+        user_ratings is a list of (movie_id, rating). The user profile is the
+        rating-weighted sum of the rated movies' vectors, and every movie is
+        scored against it with one sparse matrix-vector product, so the cost
+        does not depend on how many movies the user rated. Rated movies are
+        never recommended.
+        """
+        positions, weights = [], []
+        for movie_id, rating in user_ratings:
+            position = self.id_to_position.get(str(movie_id))
+            if position is not None and self.active[position]:
+                positions.append(position)
+                weights.append(float(rating or 0))
+        weights = np.asarray(weights, dtype=np.float64)
+        if not positions or weights.sum() <= 0:
+            return pd.DataFrame()
         
-        # Ensure 'average_rating' is numeric before multiplication
-        ratings = pd.to_numeric(self.movies['average_rating'].iloc[movie_indices], errors='coerce').fillna(0).values
+        profile = self.vectors[positions].T @ (weights / weights.sum())
+        similarities = self.vectors @ profile
+        similarities[positions] = -np.inf
+        similarities[~self.active] = -np.inf
         
-        hybrid_scores = [cos_sim * rating for cos_sim, rating in zip(cosine_similarities, ratings)]
+        n = min(n, len(similarities))
+        movie_indices = top_k(similarities[None, :], n)[0][0]
+        cosine_similarities = similarities[movie_indices]
+        keep = cosine_similarities >= max(min_similarity, 0)
+        keep &= np.isfinite(cosine_similarities)
+        return self.rank_candidates(movie_indices[keep], cosine_similarities[keep], rating_weight)
+
+    def get_batch_recommendations(self, users_ratings, n=10, min_similarity=MIN_SIMILARITY,
+                                  rating_weight=RATING_WEIGHT, batch_size=USER_BATCH_SIZE):
+        """Recommend movies for many users at once.
+
+        users_ratings maps emails to lists of (movie_id, rating). Profiles are
+        the same as in get_user_recommendations, but batch_size users are
+        scored together: their rating matrix W (users x movies) gives the
+        scores as (W @ vectors) @ vectors.T. Yields one frame per batch, with
+        an 'email' column and the rows of each user together and ranked;
+        users without a usable rating have no rows.
+        """
+        emails = list(users_ratings)
+        vectors_t = self.vectors.T.tocsc()
+        n_movies = self.vectors.shape[0]
+        n = min(n, n_movies)
+        for start in range(0, len(emails), batch_size):
+            chunk = emails[start:start + batch_size]
+            rows, cols, weights = [], [], []
+            for row, email in enumerate(chunk):
+                for movie_id, rating in users_ratings[email]:
+                    position = self.id_to_position.get(str(movie_id))
+                    if position is not None and self.active[position]:
+                        rows.append(row)
+                        cols.append(position)
+                        weights.append(float(rating or 0))
+            
+            W = sp.csr_matrix((weights, (rows, cols)), shape=(len(chunk), n_movies), dtype=np.float64)
+            totals = np.asarray(W.sum(axis=1)).ravel()
+            W = sp.diags(np.divide(1.0, totals, out=np.zeros_like(totals), where=totals > 0)) @ W
+            
+            similarities = ((W @ self.vectors) @ vectors_t).toarray()
+            similarities[rows, cols] = -np.inf
+            similarities[:, ~self.active] = -np.inf
+            top, top_similarities = top_k(similarities, n)
+            
+            hybrid_scores = top_similarities * self.ratings[top] ** rating_weight
+            order = np.lexsort((top, -top_similarities, -hybrid_scores), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_similarities = np.take_along_axis(top_similarities, order, axis=1)
+            hybrid_scores = np.take_along_axis(hybrid_scores, order, axis=1)
+            
+            keep = np.isfinite(top_similarities) & (top_similarities >= max(min_similarity, 0))
+            keep &= (totals > 0)[:, None]
+            user_rows = np.broadcast_to(np.arange(len(chunk))[:, None], top.shape)[keep]
+            
+            recommended_movies = self.movies.iloc[top[keep]].copy()
+            recommended_movies.insert(0, 'email', np.asarray(chunk, dtype=object)[user_rows])
+            recommended_movies['sim_score'] = top_similarities[keep]
+            recommended_movies['hybrid_score'] = hybrid_scores[keep]
+            yield recommended_movies
+
+    def rank_candidates(self, movie_indices, cosine_similarities, rating_weight=RATING_WEIGHT):
+        """Rows of the candidate movies with their sim_score, ranked by hybrid_score.
+
+        Ties go to the more similar movie, then to the lower position.
+        """
+        hybrid_scores = cosine_similarities * self.ratings[movie_indices] ** rating_weight
+        order = np.lexsort((movie_indices, -cosine_similarities, -hybrid_scores))
         
-        recommended_movies = self.movies.iloc[movie_indices].copy()
-        recommended_movies['sim_score'] = cosine_similarities
-        recommended_movies['hybrid_score'] = hybrid_scores
+        recommended_movies = self.movies.iloc[movie_indices[order]].copy()
+        recommended_movies['sim_score'] = cosine_similarities[order]
+        recommended_movies['hybrid_score'] = hybrid_scores[order]
         
-        return recommended_movies.sort_values('hybrid_score', ascending=False)
+        return recommended_movies
 
     def get_movie_title_by_id(self, movie_id):
         """Helper to get movie title by its MongoDB _id."""
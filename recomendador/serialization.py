@@ -0,0 +1,84 @@
+"""JSON serialization of recommendation frames."""
+
+import orjson
+import pandas as pd
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, List, Optional
+
+# Fields of every recommended movie unless ?fields= asks otherwise: what the
+# frontend shows on movie cards and on the movie detail view, plus the scores
+DEFAULT_FIELDS = (
+    "_id", "title", "year", "runtime", "genres", "cast", "directors", "fullplot", "poster",
+    "average_rating", "sim_score", "hybrid_score",
+)
+# Every field a client can ask for; internal columns (soup, genres_str, ...) are never returned
+PUBLIC_FIELDS = DEFAULT_FIELDS + (
+    "writers", "plot", "languages", "countries", "type", "awards", "lastupdated",
+    "imdb_rating", "imdb_votes", "tomato_rating", "tomato_count", "ratings_count", "weighted_rating",
+)
+INVALID_FIELDS_ERROR = f"Parameter 'fields' must be 'all' or a comma separated list of: {', '.join(PUBLIC_FIELDS)}"
+
+
+class RecommendedMovie(BaseModel):
+    """Declared shape of a recommended movie; ?fields= can add more fields."""
+
+    model_config = ConfigDict(extra="allow")
+
+    id: str = Field(alias="_id")
+    title: str
+    year: Optional[int] = None
+    runtime: Optional[int] = None
+    genres: Optional[List[str]] = None
+    cast: Optional[List[str]] = None
+    directors: Optional[List[str]] = None
+    fullplot: Optional[str] = None
+    poster: Optional[str] = None
+    average_rating: Optional[float] = None
+    # Only set on recommendations, not on top movies
+    sim_score: Optional[float] = None
+    hybrid_score: Optional[float] = None
+
+
+def parse_fields(fields):
+    """Field tuple for a ?fields= value, or None if it names unknown fields.
+
+    No value gives DEFAULT_FIELDS and 'all' every public field; _id is always
+    included.
+    """
+    if not fields:
+        return DEFAULT_FIELDS
+    if fields == "all":
+        return PUBLIC_FIELDS
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if not names or any(name not in PUBLIC_FIELDS for name in names):
+        return None
+    return tuple(dict.fromkeys(["_id"] + names))
+
+
+def to_records(frame, fields=DEFAULT_FIELDS):
+    """Rows of frame as JSON-ready dicts holding only fields.
+
+    The selected columns are converted to one object array at once. Missing
+    values become None in a single mask; _id becomes a string.
+    """
+    columns = [field for field in fields if field in frame.columns]
+    values = frame[columns].to_numpy(dtype=object)
+    # Lists and dicts are never NA, so the mask is safe on object cells
+    values[pd.isna(values)] = None
+    if "_id" in columns:
+        position = columns.index("_id")
+        values[:, position] = [str(value) for value in values[:, position]]
+    return [dict(zip(columns, row)) for row in values.tolist()]
+
+
+def dumps(content):
+    """Encode content with orjson; ObjectIds and other unknown types become strings."""
+    return orjson.dumps(content, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson, skipping FastAPI's per-value encoding."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
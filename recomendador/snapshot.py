@@ -0,0 +1,216 @@
+"""Versioned on-disk snapshots of the trained recommender.
+
+A snapshot directory looks like
+
+    <directory>/
+        LATEST                  # name of the newest complete snapshot
+        20250101T120000.000000000-1234/
+            meta.json           # format, version, creation time, parameters and stored arrays
+            state.pkl           # id maps, watermark and other small state
+            <name>.npy          # one file per dense array
+            <name>.<part>.npy   # data, indices and indptr of a sparse CSR matrix
+            <name>/             # one file per DataFrame column, plus index.npy:
+                <i>.npy         #   numeric and boolean columns
+                <i>.json        #   other columns (text, lists...), as a JSON array
+
+Every .npy file is memory-mapped on load, so workers on the same host share
+their pages instead of each unpickling a copy. Columns of Python objects are
+decoded from their JSON file, as pandas holds them as objects anyway.
+
+Snapshots are written to a temporary directory and renamed into place, and
+LATEST is replaced atomically, so readers never see a partial snapshot. The
+version, locking and pruning helpers are copied in
+randommovies/app/catalog_snapshot.py, which is built from another Docker
+context.
+"""
+
+import fcntl
+import json
+import os
+import pickle
+import shutil
+import time
+from contextlib import contextmanager
+import numpy as np
+import orjson
+import pandas as pd
+import scipy.sparse as sp
+
+# Bump when the snapshot layout or the trained state changes incompatibly
+SNAPSHOT_FORMAT = 4
+LATEST_FILE = "LATEST"
+META_FILE = "meta.json"
+STATE_FILE = "state.pkl"
+LOCK_FILE = ".lock"
+CSR_PARTS = ("data", "indices", "indptr")
+# Column dtype kinds stored as .npy: bool, integers, floats, complex, datetimes and durations
+NUMPY_KINDS = "biufcmM"
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def exclusive_lock(directory):
+    """Hold an exclusive lock on directory, shared by every process on the host"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def new_version():
+    """Snapshot version name; sorts by creation time"""
+    now = time.time_ns()
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(now // 10**9))
+    return f"{stamp}.{now % 10**9:09d}-{os.getpid()}"
+
+
+def latest_version(directory):
+    """Name of the newest complete snapshot in directory, or None"""
+    try:
+        with open(os.path.join(directory, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _save_array(path, name, value):
+    """Write value under path and return its meta.json entry"""
+    if isinstance(value, pd.DataFrame):
+        os.makedirs(os.path.join(path, name))
+        np.save(os.path.join(path, name, "index.npy"), value.index.to_numpy())
+        columns = []
+        for i, column in enumerate(value.columns):
+            values = value[column].to_numpy()
+            if values.dtype.kind in NUMPY_KINDS:
+                np.save(os.path.join(path, name, f"{i}.npy"), np.ascontiguousarray(values))
+                columns.append({"name": column, "kind": "npy"})
+            else:
+                # ObjectIds and other unknown types become strings, as in responses
+                with open(os.path.join(path, name, f"{i}.json"), "wb") as f:
+                    f.write(orjson.dumps(values.tolist(), default=str, option=orjson.OPT_SERIALIZE_NUMPY))
+                columns.append({"name": column, "kind": "json", "dtype": str(value[column].dtype)})
+        return {"kind": "frame", "columns": columns}
+    if sp.issparse(value):
+        value = value.tocsr()
+        value.sort_indices()
+        for part in CSR_PARTS:
+            np.save(os.path.join(path, f"{name}.{part}.npy"), getattr(value, part))
+        return {"kind": "csr", "shape": list(value.shape)}
+    np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(value))
+    return {"kind": "npy"}
+
+
+def _load_array(path, name, entry):
+    """Read back what _save_array wrote, memory-mapping every .npy file"""
+    if entry["kind"] == "frame":
+        index = np.load(os.path.join(path, name, "index.npy"))
+        columns = {}
+        for i, column in enumerate(entry["columns"]):
+            if column["kind"] == "npy":
+                columns[column["name"]] = np.load(os.path.join(path, name, f"{i}.npy"), mmap_mode="r")
+            else:
+                with open(os.path.join(path, name, f"{i}.json"), "rb") as f:
+                    values = np.empty(len(index), dtype=object)
+                    values[:] = orjson.loads(f.read())
+                # Restored with the dtype they were saved with, instead of letting pandas infer one
+                series = pd.Series(values, index=index, dtype=object, copy=False)
+                columns[column["name"]] = series if column["dtype"] == "object" else series.astype(column["dtype"])
+        # copy=False keeps the memory-mapped columns as they are
+        return pd.DataFrame(columns, index=index, copy=False)
+    if entry["kind"] == "csr":
+        parts = tuple(np.load(os.path.join(path, f"{name}.{part}.npy"), mmap_mode="r") for part in CSR_PARTS)
+        matrix = sp.csr_matrix(parts, shape=tuple(entry["shape"]))
+        # Saved sorted; never let scipy try to sort the read-only arrays in place
+        matrix.has_sorted_indices = True
+        return matrix
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+
+def save_snapshot(directory, arrays, state, params=None, keep=3):
+    """Write a new snapshot, point LATEST to it and return its version.
+
+    arrays maps names to NumPy arrays, sparse matrices (stored as CSR) or
+    DataFrames, state is any picklable object and params is stored in
+    meta.json to check compatibility on load. Only the newest keep snapshots
+    are kept.
+    """
+    os.makedirs(directory, exist_ok=True)
+    version = new_version()
+    tmp_dir = os.path.join(directory, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+    try:
+        entries = {name: _save_array(tmp_dir, name, value) for name, value in arrays.items()}
+        with open(os.path.join(tmp_dir, STATE_FILE), "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "created": time.time(),
+            "arrays": entries,
+            "params": params or {},
+        }
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump(meta, f)
+        os.rename(tmp_dir, os.path.join(directory, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _write_atomic(os.path.join(directory, LATEST_FILE), version)
+    prune_snapshots(directory, keep)
+    return version
+
+
+def load_snapshot(directory, params=None, version=None):
+    """Load a snapshot, the latest one by default.
+
+    Returns (version, arrays, state), with dense arrays, CSR parts and numeric
+    frame columns memory-mapped read-only, or None when there is no snapshot
+    or it was written with another format or other params.
+    """
+    version = version or latest_version(directory)
+    if not version:
+        return None
+
+    path = os.path.join(directory, version)
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read snapshot {version}: {e}")
+        return None
+
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        print(f"Snapshot {version} has format {meta.get('format')}, expected {SNAPSHOT_FORMAT}")
+        return None
+    if params is not None and meta.get("params") != params:
+        print(f"Snapshot {version} was built with {meta.get('params')}, expected {params}")
+        return None
+
+    arrays = {name: _load_array(path, name, entry) for name, entry in meta.get("arrays", {}).items()}
+    with open(os.path.join(path, STATE_FILE), "rb") as f:
+        state = pickle.load(f)
+    return version, arrays, state
+
+
+def prune_snapshots(directory, keep=3):
+    """Remove all but the newest keep snapshots, never the LATEST one"""
+    latest = latest_version(directory)
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.isdir(os.path.join(directory, name))
+    )
+    for name in versions[:-keep] if keep > 0 else versions:
+        if name != latest:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
@@ -0,0 +1,40 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The service modules import each other by name, as in the Docker image
+sys.path.insert(0, os.path.join(ROOT, "recomendador"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Read when the service modules are imported. The stand-in has no change
+# streams, and the app tests train into a directory of their own.
+SNAPSHOT_DIR = tempfile.mkdtemp(prefix="recomendador-snapshots-")
+os.environ.update(MODEL_SNAPSHOT_DIR=SNAPSHOT_DIR, MODEL_UPDATE_INTERVAL="0", MODEL_RELOAD_INTERVAL="0",
+                  MODEL_RETRY_INTERVAL="0", METRICS_ENABLED="false")
+
+import fake_mongo
+
+MOVIES = 600
+USERS = 40
+
+
+@pytest.fixture(scope="session")
+def mongo():
+    """In-memory MongoDB seeded with MOVIES movies and the ratings of USERS users"""
+    client = fake_mongo.install(MOVIES, USERS, ratings_per_user=8)
+    yield client
+    shutil.rmtree(SNAPSHOT_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def trained(mongo):
+    """A model trained on the stand-in; tests must not change its data"""
+    from recommender import Recommender
+
+    model = Recommender("mongodb://test", k=20, block_size=64)
+    model.train()
+    return model
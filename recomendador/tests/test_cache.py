@@ -0,0 +1,49 @@
+from cache import ResponseCache
+
+
+def test_hits_and_misses():
+    cache = ResponseCache()
+    assert cache.get("a") == (False, None)
+    cache.put("a", [1])
+    assert cache.get("a") == (True, [1])
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_least_recently_used_entries_are_evicted_by_count():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_by_size():
+    cache = ResponseCache(max_bytes=25, sizeof=lambda value: 10)
+    for key in "abc":
+        cache.put(key, key)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 20
+    assert cache.get("a") == (False, None)
+
+
+def test_values_larger_than_the_cap_are_not_cached():
+    cache = ResponseCache(max_bytes=5)
+    cache.put("a", "x" * 100)
+    assert cache.get("a") == (False, None)
+
+
+def test_replacing_and_invalidating_entries_keeps_the_size_exact():
+    cache = ResponseCache(sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("a", "xx")
+    cache.put("b", "xxx")
+    assert cache.stats()["bytes"] == 5
+    cache.invalidate("a")
+    assert cache.stats()["bytes"] == 3
+    cache.invalidate()
+    assert cache.stats()["entries"] == cache.stats()["bytes"] == 0
@@ -0,0 +1,125 @@
+import datetime
+import time
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from catalog import user_email
+
+
+@pytest.fixture(scope="module")
+def main(mongo):
+    import main
+
+    return main
+
+
+@pytest.fixture(scope="module")
+def client(main):
+    with TestClient(main.app) as client:
+        # With no snapshot the model trains in the background
+        deadline = time.monotonic() + 60
+        while client.get("/health/ready").status_code != 200:
+            assert time.monotonic() < deadline, "the model never became ready"
+            time.sleep(0.05)
+        yield client
+
+
+def cache_stats(client):
+    return client.get("/cache-stats").json()
+
+
+def test_health(client, main):
+    assert client.get("/health/live").json() == {"live": True}
+    health = client.get("/health").json()
+    assert health["ready"] and health["model_version"] == main.recommender.version
+
+
+def test_responses_are_cached(client):
+    email = user_email(1)
+    first = client.get(f"/recommend/{email}")
+    hits = cache_stats(client)["hits"]
+    second = client.get(f"/recommend/{email}")
+
+    assert first.status_code == 200 and len(first.json()) == 10
+    assert second.json() == first.json()
+    assert cache_stats(client)["hits"] == hits + 1
+
+
+def test_new_ratings_invalidate_the_cached_response(client, main):
+    email = user_email(2)
+    before = client.get(f"/recommend/{email}").json()
+    misses = cache_stats(client)["misses"]
+
+    main.ratings_store.collection.insert_one({
+        "email": email,
+        "movieId": before[0]["_id"],
+        "rating": 5,
+        "comment": "",
+        "timestamp": datetime.datetime(2030, 1, 1),
+    })
+    after = client.get(f"/recommend/{email}").json()
+
+    assert cache_stats(client)["misses"] == misses + 1
+    # Rated movies are never recommended
+    assert before[0]["_id"] not in [movie["_id"] for movie in after]
+
+
+def test_a_new_model_invalidates_cached_responses(client, main, monkeypatch):
+    email = user_email(3)
+    client.get(f"/recommend/{email}")
+    misses = cache_stats(client)["misses"]
+
+    monkeypatch.setattr(main, "recommender", main.recommender.apply_changes(pd.DataFrame()))
+    client.get(f"/recommend/{email}")
+    assert cache_stats(client)["misses"] == misses + 1
+
+
+def test_users_without_ratings_get_the_top_movies(client, main):
+    first = client.get("/recommend/nobody@example.com").json()
+    second = client.get("/recommend/someone@example.com").json()
+    assert first == second
+    expected = main.recommender.movies.sort_values("weighted_rating", ascending=False).head(10)
+    assert [movie["_id"] for movie in first] == expected["_id"].astype(str).tolist()
+
+
+def test_fields_and_modes(client):
+    email = user_email(4)
+    assert set(client.get(f"/recommend/{email}?fields=title").json()[0]) == {"_id", "title"}
+    assert client.get(f"/recommend/{email}?mode=seed").status_code == 200
+    assert client.get(f"/recommend/{email}?mode=other").status_code == 400
+
+
+def test_batch_matches_single_user_recommendations(client):
+    emails = [user_email(5), user_email(6), "nobody@example.com"]
+    batch = client.post("/recommend/batch", json={"emails": emails, "n": 10}).json()
+    for email in emails:
+        single = client.get(f"/recommend/{email}").json()
+        assert [movie["_id"] for movie in batch[email]] == [movie["_id"] for movie in single]
+        # The products are associated differently, so scores may differ in the last bits
+        assert [movie.get("hybrid_score") for movie in batch[email]] == \
+            pytest.approx([movie.get("hybrid_score") for movie in single])
+
+
+def test_admin_endpoints_are_hidden_without_a_token(client):
+    assert client.post("/admin/retrain").status_code == 404
+    assert client.post("/admin/retrain", headers={"X-Admin-Token": ""}).status_code == 404
+
+
+def test_retrain_requires_the_admin_token(client, main, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/retrain").status_code == 403
+    assert client.post("/admin/retrain", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    version = main.recommender.version
+    assert client.post("/admin/retrain", headers={"X-Admin-Token": "secret"}).status_code == 202
+    deadline = time.monotonic() + 60
+    while client.get("/health").json()["rebuild"]["running"]:
+        assert time.monotonic() < deadline, "the retrain never finished"
+        time.sleep(0.05)
+    health = client.get("/health").json()
+    assert health["rebuild"]["error"] is None
+    assert health["model_version"] != version
+    # Every model uses the process' movies client
+    assert main.recommender.client is main.movies_client
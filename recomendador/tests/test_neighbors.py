@@ -0,0 +1,58 @@
+import numpy as np
+import scipy.sparse as sp
+
+from neighbors import NeighborIndex, normalize_vectors, top_k
+
+
+def binary_vectors(rng, rows, columns=6):
+    # Few features, so many movies share exactly the same similarity
+    return normalize_vectors(sp.csr_matrix(rng.integers(0, 2, size=(rows, columns)).astype(np.float32)))
+
+
+def stable_top(similarities, k):
+    """Top k of every row by descending score, lower positions first among ties"""
+    return np.array([sorted(range(row.size), key=lambda j: -row[j])[:k] for row in similarities])
+
+
+def test_top_k_breaks_ties_by_column_order():
+    block = np.array([[1.0, 3.0, 3.0, 2.0, 3.0, 3.0]])
+    indices, scores = top_k(block, 3)
+    assert indices.tolist() == [[1, 2, 4]]
+    assert scores.tolist() == [[3.0, 3.0, 3.0]]
+
+
+def test_top_k_breaks_ties_by_positions():
+    block = np.array([[3.0, 3.0, 1.0, 3.0]])
+    indices, _ = top_k(block, 2, positions=np.array([[9, 4, 1, 7]]))
+    assert indices.tolist() == [[1, 3]]
+
+
+def test_build_matches_a_stable_sort():
+    vectors = binary_vectors(np.random.default_rng(0), 300)
+    index = NeighborIndex.build(vectors, k=15, block_size=64)
+
+    similarities = (vectors @ vectors.T).toarray()
+    np.fill_diagonal(similarities, -np.inf)
+    expected = stable_top(similarities, 15)
+    assert (index.neighbors == expected).all()
+    assert np.allclose(index.scores, np.take_along_axis(similarities, expected, axis=1))
+
+
+def test_updated_matches_a_fresh_build():
+    rng = np.random.default_rng(1)
+    vectors = binary_vectors(rng, 300)
+    index = NeighborIndex.build(vectors, k=15, block_size=64)
+
+    # Change three movies, remove one and append five
+    matrix = vectors.tolil()
+    changed = [3, 100, 299]
+    for row in changed:
+        matrix[row] = rng.integers(0, 2, size=6)
+    matrix[50] = 0
+    appended = sp.csr_matrix(rng.integers(0, 2, size=(5, 6)).astype(np.float32))
+    vectors = normalize_vectors(sp.vstack([matrix.tocsr(), appended]).tocsr())
+
+    updated = index.updated(vectors, changed + [50] + list(range(300, 305)), block_size=64)
+    fresh = NeighborIndex.build(vectors, k=15, block_size=64)
+    assert (updated.neighbors == fresh.neighbors).all()
+    assert np.allclose(updated.scores, fresh.scores)
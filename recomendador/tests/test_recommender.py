@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from catalog import user_email
+from neighbors import NeighborIndex, normalize_vectors
+import recommender
+from recommender import Recommender, flatten_movies
+
+
+def movie_document(mongo, model, position):
+    return mongo.sample_mflix.movies.find_one({"_id": model.movies["_id"].iloc[position]})
+
+
+@pytest.fixture(scope="module")
+def changes(mongo, trained):
+    """Changed movie documents and deleted ids of one update, with what they stand for"""
+    changed = dict(movie_document(mongo, trained, 5), title="Changed Title", genres=["Documentary"])
+    # No longer passes the filters, so it is removed
+    uncast = dict(movie_document(mongo, trained, 9), cast=[])
+    added = dict(movie_document(mongo, trained, 11), _id=ObjectId(), title="Brand New Movie")
+    deleted = str(trained.movies["_id"].iloc[7])
+    return {
+        "documents": [changed, uncast, added],
+        "deleted_ids": [deleted],
+        "removed": [7, 9],
+        "changed": 5,
+        "added": str(added["_id"]),
+    }
+
+
+@pytest.fixture(scope="module")
+def updated(trained, changes):
+    return trained.apply_changes(flatten_movies(changes["documents"]), changes["deleted_ids"])
+
+
+def test_apply_changes_matches_a_fresh_neighbor_index(trained, updated):
+    fresh = NeighborIndex.build(updated.vectors, k=trained.k, block_size=trained.block_size)
+    assert (updated.neighbor_index.neighbors == fresh.neighbors).all()
+    assert np.allclose(updated.neighbor_index.scores, fresh.scores)
+
+
+def test_apply_changes_vectorizes_changed_movies_with_the_trained_vocabulary(trained, updated, changes):
+    active = np.flatnonzero(updated.active)
+    expected = normalize_vectors(trained.vectorizer.transform(updated.movies["soup"].iloc[active]))
+    assert abs(updated.vectors[active] - expected).max() < 1e-6
+    assert updated.vectors[changes["removed"]].nnz == 0
+
+
+def test_apply_changes_splices_movies_in_place(trained, updated, changes):
+    n_old = len(trained.movies)
+    assert len(updated.movies) == n_old + 1
+    assert updated.id_to_position[changes["added"]] == n_old
+    assert updated.movies["title"].iloc[changes["changed"]] == "Changed Title"
+    assert not updated.active[changes["removed"]].any()
+    for position in changes["removed"]:
+        assert str(trained.movies["_id"].iloc[position]) not in updated.id_to_title
+
+    recommended = updated.get_recommendations("Brand New Movie", n=30)
+    assert not recommended.empty
+    assert not set(recommended.index) & set(changes["removed"])
+
+
+def test_apply_changes_leaves_the_serving_model_alone(trained, updated, changes):
+    assert len(trained.movies) == len(updated.movies) - 1
+    assert trained.active.all()
+    assert trained.movies["title"].iloc[changes["changed"]] != "Changed Title"
+    assert changes["added"] not in trained.id_to_position
+
+
+def test_loaded_snapshots_take_updates_like_trained_models(tmp_path, trained, changes, updated):
+    trained.save_snapshot(str(tmp_path))
+    loaded = Recommender("mongodb://test", k=trained.k, block_size=trained.block_size)
+    loaded.load_snapshot(str(tmp_path))
+    reloaded = loaded.apply_changes(flatten_movies(changes["documents"]), changes["deleted_ids"])
+
+    assert (reloaded.neighbor_index.neighbors == updated.neighbor_index.neighbors).all()
+    assert (reloaded.vectors != updated.vectors).nnz == 0
+    assert reloaded.movies["title"].tolist() == updated.movies["title"].tolist()
+
+
+def test_loaded_snapshots_fetch_changes_with_the_shared_client(tmp_path, mongo, trained, monkeypatch):
+    trained.save_snapshot(str(tmp_path))
+    loaded = Recommender("mongodb://test", k=trained.k, block_size=trained.block_size, client=mongo)
+    loaded.load_snapshot(str(tmp_path))
+    monkeypatch.setattr(recommender, "MongoClient", lambda *args, **kwargs: pytest.fail("opened a new client"))
+
+    movie_id = trained.movies["_id"].iloc[7]
+    changes = loaded.fetch_changes([movie_id])
+    assert movie_id in set(changes["_id"])
+
+
+def test_user_recommendations_skip_rated_movies(mongo, trained):
+    rated = list(mongo.ratings_db.ratings.find({"email": user_email(1)}))
+    recommended = trained.get_user_recommendations([(r["movieId"], r["rating"]) for r in rated])
+    assert len(recommended) == 10
+    assert not set(recommended["_id"].astype(str)) & {str(r["movieId"]) for r in rated}
+    assert recommended["hybrid_score"].is_monotonic_decreasing
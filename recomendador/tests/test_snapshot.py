@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from recommender import Recommender
+
+
+def is_memory_mapped(array):
+    while array is not None and not isinstance(array, np.memmap):
+        array = getattr(array, "base", None)
+    return array is not None
+
+
+def load(directory, trained):
+    model = Recommender("mongodb://test", k=trained.k, block_size=trained.block_size)
+    assert model.load_snapshot(directory)
+    return model
+
+
+def test_snapshot_round_trip(tmp_path, trained):
+    version = trained.save_snapshot(str(tmp_path))
+    loaded = load(str(tmp_path), trained)
+    assert loaded.version == version
+
+    # ObjectIds are saved as strings, as they are returned
+    expected = trained.movies.assign(_id=trained.movies["_id"].astype(str).astype(object))
+    # A copy, as the memory-mapped columns are not plain ndarrays
+    pd.testing.assert_frame_equal(loaded.movies.copy(), expected)
+    assert (loaded.vectors != trained.vectors).nnz == 0
+    assert (loaded.neighbor_index.neighbors == trained.neighbor_index.neighbors).all()
+    assert list(loaded.vectorizer.get_feature_names_out()) == list(trained.vectorizer.get_feature_names_out())
+    assert loaded.id_to_position == trained.id_to_position
+    assert loaded.watermark == trained.watermark
+
+    title = trained.movies["title"].iloc[3]
+    pd.testing.assert_frame_equal(loaded.get_recommendations(title).drop(columns="_id"),
+                                  trained.get_recommendations(title).drop(columns="_id"))
+
+
+def test_snapshots_of_another_k_are_not_loaded(tmp_path, trained):
+    trained.save_snapshot(str(tmp_path))
+    assert not Recommender("mongodb://test", k=trained.k + 1).load_snapshot(str(tmp_path))
+
+
+def test_snapshots_are_memory_mapped(tmp_path, trained):
+    trained.save_snapshot(str(tmp_path))
+    loaded = load(str(tmp_path), trained)
+    assert is_memory_mapped(loaded.neighbor_index.neighbors)
+    assert is_memory_mapped(loaded.vectors.data)
+    assert is_memory_mapped(loaded.movies["weighted_rating"].to_numpy())
+    # Text and list columns are decoded, not memory-mapped
+    assert not is_memory_mapped(loaded.movies["title"].to_numpy())
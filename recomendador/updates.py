@@ -0,0 +1,78 @@
+"""Change detection for the movies collection."""
+
+import time
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+class CatalogWatcher:
+    """Waits for changes to the movies collection.
+
+    Uses a MongoDB change stream when the deployment supports it (replica sets
+    and sharded clusters), which wakes the updater as soon as a movie changes
+    and reports updated and deleted ids. On a standalone server it falls back
+    to sleeping for the poll interval; changes are then found through the
+    recommender watermark alone.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.supported = True
+        self._stream = None
+        self._resume_token = None
+
+    def _open(self):
+        if self._stream is None:
+            self._stream = self.collection.watch(
+                [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}],
+                resume_after=self._resume_token,
+                max_await_time_ms=1000,
+            )
+        return self._stream
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for changes.
+
+        Returns (changed_ids, deleted_ids) seen on the change stream, both
+        empty when polling.
+        """
+        if self.supported:
+            try:
+                return self._wait_stream(timeout)
+            except OperationFailure as e:
+                print(f"Change streams not available, polling for movie changes: {e}")
+                self.supported = False
+                self.close()
+            except PyMongoError as e:
+                print(f"Change stream interrupted: {e}")
+                self.close()
+                return set(), set()
+        time.sleep(timeout)
+        return set(), set()
+
+    def _wait_stream(self, timeout):
+        changed, deleted = set(), set()
+        stream = self._open()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            event = stream.try_next()
+            if event is None:
+                if changed or deleted:
+                    break
+                continue
+            self._resume_token = stream.resume_token
+            movie_id = event["documentKey"]["_id"]
+            if event["operationType"] == "delete":
+                deleted.add(movie_id)
+                changed.discard(movie_id)
+            else:
+                changed.add(movie_id)
+                deleted.discard(movie_id)
+        return changed, deleted
+
+    def close(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except PyMongoError:
+                pass
+            self._stream = None